@@ -0,0 +1,138 @@
+"""
+Scaling benchmark running all stages of the map generation for increasing numbers of points.
+For every stage it fits the exponent k of time ~ points^k (and the same for peak memory)
+and flags stages growing faster than linearly.
+
+Run from the root of the repository:
+    python -m benchmarks.scaling
+    python -m benchmarks.scaling --sizes 1000 5000 --no-plot
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import matplotlib
+import numpy as np
+
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt  # noqa: E402
+
+import data  # noqa: E402
+import exporter  # noqa: E402
+import plot  # noqa: E402
+import raster  # noqa: E402
+from pipeline import Pipeline  # noqa: E402
+from profiling import Profiler  # noqa: E402
+from world_generation import stages, fixes  # noqa: E402
+
+SIZES = [1000, 5000, 25000, 100000, 250000]
+SEED = 1
+bounding_box = [(0, 1), (0, 1)]
+
+# exponent above which a stage is reported as super-linear, leaving some room for n log n
+SUPER_LINEAR_EXPONENT = 1.2
+
+
+def benchmark_size(number_of_points, seed=SEED, trace_memory=True, with_plot=True):
+    """
+    Runs all stages for a single number of points without using any cached outputs
+    :return: profiles of the stages
+    """
+    profiler = Profiler(trace_memory=trace_memory)
+    with tempfile.TemporaryDirectory() as directory:
+        pipeline = Pipeline(stages.map_stages(number_of_points, bounding_box), seed, directory, profiler)
+        # the fix after clustering fails for some seeds, it's measured separately below
+        world = pipeline.run(until="clustering", force=True)
+        try:
+            with profiler.stage("fixes_after_clustering"):
+                fixes.remove_artifacts_after_clustering(world)
+        except ValueError as error:
+            print("fixes_after_clustering failed:", error)
+            profiler.stages.pop()
+
+        if with_plot:
+            working_directory = os.getcwd()
+            os.chdir(directory)
+            try:
+                with profiler.stage("plot"):
+                    plot.plot_map(world, True)
+                plt.close("all")
+            finally:
+                os.chdir(working_directory)
+            with profiler.stage("raster"):
+                raster.render_map(world)
+        with profiler.stage("export"):
+            exporter.export(data.merge_heights_into_blobs(world))
+    return profiler.stages
+
+
+def fit_exponent(sizes, values):
+    """
+    Slope of the least squares line fitted to log(values) over log(sizes)
+    """
+    sizes, values = np.asarray(sizes, dtype=float), np.asarray(values, dtype=float)
+    valid = values > 0
+    if valid.sum() < 2:
+        return None
+    return float(np.polyfit(np.log(sizes[valid]), np.log(values[valid]), 1)[0])
+
+
+def run_benchmark(sizes, seed=SEED, trace_memory=True, with_plot=True):
+    profiles_by_size = {}
+    for number_of_points in sizes:
+        start = time.time()
+        profiles_by_size[number_of_points] = {profile.name: profile for profile in
+                                              benchmark_size(number_of_points, seed, trace_memory, with_plot)}
+        print("{} points done in {:.1f} s".format(number_of_points, time.time() - start))
+
+    stage_names = list(profiles_by_size[sizes[0]].keys())
+    results = {"sizes": sizes, "seed": seed, "stages": {}}
+    for stage_name in stage_names:
+        measured_sizes = [size for size in sizes if stage_name in profiles_by_size[size]]
+        seconds = [profiles_by_size[size][stage_name].wall_seconds for size in measured_sizes]
+        memory = [profiles_by_size[size][stage_name].peak_memory_bytes for size in measured_sizes]
+        time_exponent = fit_exponent(measured_sizes, seconds)
+        results["stages"][stage_name] = {
+            "sizes": measured_sizes,
+            "wall_seconds": seconds,
+            "peak_memory_bytes": memory,
+            "time_exponent": time_exponent,
+            "memory_exponent": fit_exponent(measured_sizes, memory) if trace_memory else None,
+            "super_linear": time_exponent is not None and time_exponent > SUPER_LINEAR_EXPONENT,
+        }
+    return results
+
+
+def print_results(results):
+    print("{:<24}{}{:>10}{:>10}".format("stage", "".join("{:>12}".format(size) for size in results["sizes"]),
+                                        "time k", "memory k"))
+    for stage_name, stage in results["stages"].items():
+        seconds_by_size = dict(zip(stage["sizes"], stage["wall_seconds"]))
+        print("{:<24}{}{:>10}{:>10}{}".format(
+            stage_name,
+            "".join("{:>12}".format("{:.3f}s".format(seconds_by_size[size]) if size in seconds_by_size else "-")
+                    for size in results["sizes"]),
+            _format_exponent(stage["time_exponent"]),
+            _format_exponent(stage["memory_exponent"]),
+            "  SUPER-LINEAR" if stage["super_linear"] else ""))
+
+
+def _format_exponent(exponent):
+    return "-" if exponent is None else "{:.2f}".format(exponent)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure how stages of the map generation scale")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--no-memory", action="store_true", help="don't trace memory, which slows stages down")
+    parser.add_argument("--no-plot", action="store_true", help="skip plotting, which is slow for big maps")
+    parser.add_argument("--output", default="benchmark_results.json")
+    args = parser.parse_args()
+
+    benchmark_results = run_benchmark(args.sizes, args.seed, not args.no_memory, not args.no_plot)
+    print_results(benchmark_results)
+    with open(args.output, "w") as file:
+        json.dump(benchmark_results, file, indent=2)
@@ -0,0 +1,106 @@
+from typing import List
+
+import numpy as np
+from shapely.geometry import Polygon, MultiPolygon
+from shapely.ops import unary_union
+
+import profiling
+
+
+def polygons_of_components(component_by_region: np.ndarray, components_count: int, world) -> List:
+    """
+    Outlines of groups of regions, e.g. terrain clusters, traced straight from the mesh.
+    Regions tile the plane, so the outline of a group consists of edges of its regions
+    which have a region of a different group (or no region at all) on the other side.
+    :param component_by_region: id of the group of every region, -1 for regions not belonging to any group
+    :return: Polygon or MultiPolygon of every group
+    """
+    incidence = world.incidence()
+    region_of_edge = incidence.region_of_entry
+    edge_starts = incidence.vertices
+    ring_starts = incidence.indptr[:-1]
+    ring_sizes = np.diff(incidence.indptr)
+
+    # half-edges go from every vertex of the region ring to the next one
+    next_in_ring = np.arange(1, len(edge_starts) + 1)
+    next_in_ring[ring_starts + ring_sizes - 1] = ring_starts
+    edge_ends = edge_starts[next_in_ring]
+
+    # orient all rings counterclockwise, so regions are on the left side of their half-edges
+    positions = world.vertex_positions()
+    start_x, start_y = positions[edge_starts, 0], positions[edge_starts, 1]
+    end_x, end_y = positions[edge_ends, 0], positions[edge_ends, 1]
+    clockwise = np.add.reduceat(start_x * end_y - end_x * start_y, ring_starts) < 0
+    reversed_edge = clockwise[region_of_edge]
+    edge_starts, edge_ends = (np.where(reversed_edge, edge_ends, edge_starts),
+                              np.where(reversed_edge, edge_starts, edge_ends))
+    previous_in_ring = np.empty_like(next_in_ring)
+    previous_in_ring[next_in_ring] = np.arange(len(next_in_ring))
+    next_in_ring = np.where(reversed_edge, previous_in_ring, next_in_ring)
+
+    # twin is the same edge in the opposite direction belonging to the neighbouring region
+    vertices_size = len(positions)
+    edge_keys = edge_starts * vertices_size + edge_ends
+    sorted_edges = np.argsort(edge_keys)
+    twin_keys = edge_ends * vertices_size + edge_starts
+    twin_position = np.minimum(np.searchsorted(edge_keys[sorted_edges], twin_keys), len(edge_keys) - 1)
+    twin = sorted_edges[twin_position]
+    has_twin = edge_keys[twin] == twin_keys
+
+    component_of_edge = component_by_region[region_of_edge]
+    twin_component = np.where(has_twin, component_by_region[region_of_edge[twin]], -1)
+    is_boundary = (component_of_edge >= 0) & (component_of_edge != twin_component)
+
+    # the next boundary edge is found by rotating around the end vertex through regions of the same component
+    boundary_edges = np.flatnonzero(is_boundary)
+    next_boundary = next_in_ring[boundary_edges]
+    inside = ~is_boundary[next_boundary]
+    while inside.any():
+        next_boundary[inside] = next_in_ring[twin[next_boundary[inside]]]
+        inside[inside] = ~is_boundary[next_boundary[inside]]
+    next_boundary_by_edge = np.full(len(edge_starts), -1, dtype=np.int64)
+    next_boundary_by_edge[boundary_edges] = next_boundary
+
+    rings_by_component = [[] for _ in range(components_count)]
+    visited = np.zeros(len(edge_starts), dtype=bool)
+    next_boundary_list = next_boundary_by_edge.tolist()
+    edge_starts_list = edge_starts.tolist()
+    for first_edge in boundary_edges.tolist():
+        if visited[first_edge]:
+            continue
+        ring = []
+        edge = first_edge
+        while not visited[edge]:
+            visited[edge] = True
+            ring.append(edge_starts_list[edge])
+            edge = next_boundary_list[edge]
+        rings_by_component[component_of_edge[first_edge]].append(positions[ring])
+
+    polygons = []
+    for component_id, rings in enumerate(rings_by_component):
+        polygon = _polygon_from_rings(rings)
+        if not polygon.is_valid:
+            regions = np.flatnonzero(component_by_region == component_id).tolist()
+            profiling.count("shapely_unions", len(regions))
+            polygon = unary_union([world.polygon_by_region[region_id] for region_id in regions])
+        polygons.append(polygon)
+    return polygons
+
+
+def _polygon_from_rings(rings: List[np.ndarray]):
+    exteriors = []
+    holes = []
+    for ring in rings:
+        x, y = ring[:, 0], ring[:, 1]
+        signed_area = np.sum(x * np.roll(y, -1) - np.roll(x, -1) * y)
+        (exteriors if signed_area > 0 else holes).append(ring)
+
+    if len(exteriors) == 1:
+        return Polygon(exteriors[0], holes)
+    holes_by_exterior = [[] for _ in exteriors]
+    exterior_polygons = [Polygon(exterior) for exterior in exteriors]
+    for hole in holes:
+        point_in_hole = Polygon(hole).representative_point()
+        containing = [i for i, exterior in enumerate(exterior_polygons) if exterior.contains(point_in_hole)]
+        holes_by_exterior[containing[0] if containing else 0].append(hole)
+    return MultiPolygon([Polygon(exterior, holes) for exterior, holes in zip(exteriors, holes_by_exterior)])
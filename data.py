@@ -1,8 +1,15 @@
 import itertools
+from collections import OrderedDict
+from collections.abc import Mapping, MutableMapping
 from typing import List, Tuple, Dict, Set, Callable, Iterable
 
+import numpy as np
 from shapely.geometry import Polygon, Point, LineString
 
+from boundaries import polygons_of_components
+from graph import CsrAdjacency, Incidence, label_components, nodes_by_component
+from spatial import PointIndex, GeometryIndex, BoundsIndex
+
 MIN_MOUNTAIN_HEIGHT = 0.6
 
 RegionId = int
@@ -20,43 +27,393 @@ class World:
             vertices_by_region: Dict[RegionId, List[VertexId]],
             vertices_touching_vertex: Dict[VertexId, Set[VertexId]],
             regions_touching_vertex: Dict[VertexId, Set[RegionId]],
-            polygon_by_region: Dict[RegionId, Polygon]
+            polygon_by_region: Dict[RegionId, Polygon],
+            compact_topology: bool = True
     ):
+        """
+        Adjacency can be given either as dicts of sets or as CsrAdjacency, it's stored as CSR arrays
+        in `region_graph`, `vertex_graph` and `vertex_region_graph`.
+        With `compact_topology` (the default) the dict attributes are views over these arrays.
+        Without it they're read-only dicts of frozensets, which take more memory but are faster to look up.
+        """
         self.center_by_region = center_by_region
         self.pos_by_vertex = pos_by_vertex
         self.vertices_by_region = vertices_by_region
         self.polygon_by_region = polygon_by_region
-        self.regions_touching_region = regions_touching_region
-        self.vertices_touching_vertex = vertices_touching_vertex
-        self.regions_touching_vertex = regions_touching_vertex
+        self.region_graph = CsrAdjacency.from_mapping(regions_touching_region)
+        self.vertex_graph = CsrAdjacency.from_mapping(vertices_touching_vertex)
+        self.vertex_region_graph = CsrAdjacency.from_mapping(regions_touching_vertex)
+        self.regions_touching_region = _adjacency_attribute(regions_touching_region, self.region_graph,
+                                                            compact_topology)
+        self.vertices_touching_vertex = _adjacency_attribute(vertices_touching_vertex, self.vertex_graph,
+                                                             compact_topology)
+        self.regions_touching_vertex = _adjacency_attribute(regions_touching_vertex, self.vertex_region_graph,
+                                                            compact_topology)
         self.regions_count = len(center_by_region)
-        self.vertices_count = len(regions_touching_vertex)
+        self.vertices_count = len(self.regions_touching_vertex)
         self.height_by_vertex: Dict[VertexId, float] = None
+        self.chain_by_vertex: Dict[VertexId, int] = None
         self.height_by_region: Dict[RegionId, float] = None
-        self.terrain_by_region: Dict[RegionId, TerrainGroup] = None
+        self.terrain_codes: np.ndarray = None
+        self.terrain_by_region: Dict[RegionId, str] = None
         self.downslopes: Dict[VertexId, Set[VertexId]] = None
+        self.downslope_graph: CsrAdjacency = None
+        self.steepest_downslope: np.ndarray = None
         self.rivers: List[List[VertexId]] = []
         self.moisture_by_vertex: Dict[VertexId, float] = None
         self.mountain_chains: List[ChainDescriptor] = None
+        self.noise_fields: Dict[tuple, np.ndarray] = {}
         self.clusters: List[Cluster] = None
+        self._incidence: Incidence = None
+        self._vertex_positions: np.ndarray = None
+        self._vertex_index: PointIndex = None
+        self._region_index: PointIndex = None
+        self._region_polygon_index: GeometryIndex = None
+        self._cluster_index: GeometryIndex = None
+        self._indexed_clusters: List[Cluster] = None
+
+    def __getstate__(self):
+        # spatial indexes hold all the geometries, they're rebuilt after unpickling when needed
+        state = self.__dict__.copy()
+        for index in ["_vertex_index", "_region_index", "_region_polygon_index", "_cluster_index", "_indexed_clusters"]:
+            state[index] = None
+        return state
+
+    def incidence(self) -> Incidence:
+        """
+        Sparse region x vertex incidence operators, built on the first use
+        """
+        if self._incidence is None:
+            self._incidence = Incidence.from_mapping(self.vertices_by_region, self.vertex_graph.size)
+        return self._incidence
+
+    def vertex_array(self, value_by_vertex: Dict[VertexId, float], fill=np.nan) -> np.ndarray:
+        """
+        Values from the dict as an array indexed by vertex id, `fill` for ids missing in the dict
+        """
+        values = np.full(self.vertex_graph.size, fill, dtype=float)
+        values[np.fromiter(value_by_vertex.keys(), dtype=np.int64, count=len(value_by_vertex))] = \
+            np.fromiter(value_by_vertex.values(), dtype=float, count=len(value_by_vertex))
+        return values
+
+    def vertex_positions(self) -> np.ndarray:
+        """
+        Positions of vertices as an (n, 2) array indexed by vertex id, NaN for ids not used by any region
+        """
+        if self._vertex_positions is None:
+            self._vertex_positions = np.full((self.vertex_graph.size, 2), np.nan)
+            self._vertex_positions[np.fromiter(self.pos_by_vertex.keys(), dtype=np.int64)] = \
+                np.array(list(self.pos_by_vertex.values()), dtype=float).reshape(-1, 2)
+        return self._vertex_positions
+
+    def region_array(self, value_by_region: Dict[RegionId, float], fill=np.nan) -> np.ndarray:
+        values = np.full(self.regions_count, fill, dtype=float)
+        values[np.fromiter(value_by_region.keys(), dtype=np.int64, count=len(value_by_region))] = \
+            np.fromiter(value_by_region.values(), dtype=float, count=len(value_by_region))
+        return values
+
+    def vertex_index(self) -> PointIndex:
+        """
+        Spatial index of vertex positions, built on the first use
+        """
+        if self._vertex_index is None:
+            self._vertex_index = PointIndex.from_mapping(self.pos_by_vertex)
+        return self._vertex_index
+
+    def region_index(self) -> PointIndex:
+        """
+        Spatial index of region centers, built on the first use.
+        Centers are the points generating the Voronoi diagram, so the nearest center gives the region containing a point.
+        """
+        if self._region_index is None:
+            self._region_index = PointIndex.from_mapping(self.center_by_region)
+        return self._region_index
+
+    def region_polygon_index(self):
+        """
+        STRtree over region polygons, built on the first use.
+        When polygons are built lazily with a bounded cache, only their bounding boxes are indexed,
+        so the index doesn't keep all polygons in memory.
+        """
+        if self._region_polygon_index is None:
+            if isinstance(self.polygon_by_region, PolygonMapping) and self.polygon_by_region.cache_size is not None:
+                self._region_polygon_index = BoundsIndex(self.polygon_by_region, np.arange(len(self.polygon_by_region)),
+                                                         self.polygon_by_region.bounds())
+            else:
+                self._region_polygon_index = GeometryIndex(self.polygon_by_region)
+        return self._region_polygon_index
+
+    def cluster_index(self) -> GeometryIndex:
+        """
+        STRtree over polygons of clusters, keyed by position in `clusters`. It's rebuilt when clusters are replaced.
+        """
+        if self._cluster_index is None or self._indexed_clusters is not self.clusters:
+            self._cluster_index = GeometryIndex({i: cluster.polygon for i, cluster in enumerate(self.clusters)})
+            self._indexed_clusters = self.clusters
+        return self._cluster_index
+
+    def nearest_vertex(self, points):
+        return self.vertex_index().nearest(points)
+
+    def nearest_region(self, points):
+        return self.region_index().nearest(points)
+
+    def k_nearest_vertices(self, points, k: int):
+        return self.vertex_index().k_nearest(points, k)
+
+    def k_nearest_regions(self, points, k: int):
+        return self.region_index().k_nearest(points, k)
+
+
+class CodedMapping(MutableMapping):
+    """
+    Dict-like view of an array of integer codes indexed by region, which gets and sets names of the codes
+    """
+
+    def __init__(self, codes: np.ndarray, names: List[str]):
+        self.codes = codes
+        self.names = names
+        self._code_by_name = {name: code for code, name in enumerate(names)}
+
+    def __getitem__(self, key):
+        if not 0 <= key < len(self.codes):
+            raise KeyError(key)
+        return self.names[self.codes[key]]
+
+    def __setitem__(self, key, name):
+        if not 0 <= key < len(self.codes):
+            raise KeyError(key)
+        self.codes[key] = self._code_by_name[name]
+
+    def __delitem__(self, key):
+        raise TypeError("regions can't be removed")
+
+    def __iter__(self):
+        return iter(range(len(self.codes)))
+
+    def __len__(self):
+        return len(self.codes)
+
+
+class PolygonMapping(Mapping):
+    """
+    Read-only dict-like view building Polygons of regions from their vertex rings only when they're used.
+    Built polygons are kept in a LRU cache, they are not pickled.
+    """
+
+    def __init__(self, positions: np.ndarray, indptr: np.ndarray, vertices: np.ndarray, cache_size: int = None):
+        """
+        :param cache_size: maximum number of cached polygons, unlimited when None
+        """
+        self.positions = positions
+        self.indptr = indptr
+        self.vertices = vertices
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+
+    def __getitem__(self, region_id):
+        polygon = self._cache.get(region_id)
+        if polygon is not None:
+            self._cache.move_to_end(region_id)
+            return polygon
+        if not 0 <= region_id < len(self.indptr) - 1:
+            raise KeyError(region_id)
+        polygon = Polygon(self.positions[self.vertices[self.indptr[region_id]:self.indptr[region_id + 1]]].tolist())
+        if self.cache_size != 0:
+            self._cache[region_id] = polygon
+            if self.cache_size is not None and len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return polygon
+
+    def __iter__(self):
+        return iter(range(len(self.indptr) - 1))
+
+    def __len__(self):
+        return len(self.indptr) - 1
+
+    def bounds(self) -> np.ndarray:
+        """
+        (min_x, min_y, max_x, max_y) of every region, computed without building the polygons
+        """
+        ring_positions = self.positions[self.vertices]
+        starts = self.indptr[:-1]
+        return np.hstack([np.minimum.reduceat(ring_positions, starts), np.maximum.reduceat(ring_positions, starts)])
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_cache"] = OrderedDict()
+        return state
+
+
+class ArrayMapping(Mapping):
+    """
+    Read-only dict-like view of an array indexed by id, e.g. of a world loaded by `storage.load_world`.
+    Rows of 2D arrays are returned as tuples.
+    """
+
+    def __init__(self, values: np.ndarray, present: np.ndarray = None):
+        """
+        :param present: mask of ids having a value, all ids by default
+        """
+        self.values = values
+        self.present = np.ones(len(values), dtype=bool) if present is None else present
+
+    def __getitem__(self, key):
+        if not 0 <= key < len(self.values) or not self.present[key]:
+            raise KeyError(key)
+        value = self.values[key]
+        return tuple(value.tolist()) if self.values.ndim > 1 else value.item()
+
+    def __contains__(self, key):
+        return isinstance(key, (int, np.integer)) and 0 <= key < len(self.values) and bool(self.present[key])
+
+    def __iter__(self):
+        return iter(np.flatnonzero(self.present).tolist())
+
+    def __len__(self):
+        return int(np.count_nonzero(self.present))
+
+
+def _adjacency_attribute(adjacency, graph: CsrAdjacency, compact_topology: bool):
+    if compact_topology:
+        return graph.view()
+    # built from the arrays, so it can't differ from them
+    return _FrozenAdjacency(graph.to_dict())
+
+
+class _FrozenAdjacency(Mapping):
+    """
+    Read-only dict of sets of neighbours
+    """
+
+    def __init__(self, neighbours_by_node: Dict[int, Set[int]]):
+        self._neighbours_by_node = {node: frozenset(neighbours) for node, neighbours in neighbours_by_node.items()}
+
+    def __getitem__(self, node):
+        return self._neighbours_by_node[node]
+
+    def __contains__(self, node):
+        return node in self._neighbours_by_node
+
+    def __iter__(self):
+        return iter(self._neighbours_by_node)
+
+    def __len__(self):
+        return len(self._neighbours_by_node)
+
+
+def convert_to_world(np_vertices_by_region, np_center_by_region, np_vertices, compact_topology=True,
+                     vectorized=True):
+    if not vectorized:
+        return _convert_to_world_per_element(np_vertices_by_region, np_center_by_region, np_vertices,
+                                             compact_topology)
+    vertices_by_region = _calculate_vertices_by_region(np_vertices_by_region)
+    polygon_by_region = _calculate_polygon_by_region(np_vertices, np_vertices_by_region)
+
+    region_sizes = np.array([len(region_vertices) for region_vertices in np_vertices_by_region], dtype=np.int64)
+    flat_vertices = np.fromiter(itertools.chain.from_iterable(np_vertices_by_region), dtype=np.int64,
+                                count=region_sizes.sum())
+    region_of_entry = np.repeat(np.arange(len(region_sizes)), region_sizes)
+    # index of the next vertex on the ring of the same region
+    next_entry = np.arange(1, len(flat_vertices) + 1)
+    region_ends = np.cumsum(region_sizes)
+    next_entry[region_ends - 1] = region_ends - region_sizes
+    next_vertices = flat_vertices[next_entry]
+
+    used_vertices = np.unique(flat_vertices)
+    vertices_size = len(np_vertices)
+    regions_touching_vertex = CsrAdjacency.from_edges(flat_vertices, region_of_entry, vertices_size, used_vertices)
+    vertices_touching_vertex = CsrAdjacency.from_edges(np.concatenate([flat_vertices, next_vertices]),
+                                                       np.concatenate([next_vertices, flat_vertices]),
+                                                       vertices_size, used_vertices)
+    regions_touching_region = _region_neighbours_from_shared_vertices(regions_touching_vertex, len(region_sizes))
+
+    pos_by_vertex = dict(zip(used_vertices.tolist(), map(tuple, np.asarray(np_vertices)[used_vertices].tolist())))
+    center_by_region = {k: v for k, v in enumerate(np_center_by_region)}
+
+    return World(center_by_region, pos_by_vertex, regions_touching_region, vertices_by_region, vertices_touching_vertex,
+                 regions_touching_vertex, polygon_by_region, compact_topology)
+
+
+def convert_voronoi_to_world(vor, compact_topology=True, edge_neighbours_only=False, polygon_cache_size=None):
+    """
+    Builds the world straight from scipy's Voronoi diagram filtered by `voronoi._voronoi`.
+    Topology is taken from `vor.ridge_points` and `vor.ridge_vertices`, which already are region-to-region
+    and vertex-to-vertex edges, so there is no need to walk the polygon rings.
+    :param edge_neighbours_only: when set, regions touching only at a corner are not neighbours
+    :param polygon_cache_size: maximum number of region polygons kept in memory, see `PolygonMapping`
+    """
+    regions_count = len(vor.filtered_region_indices)
+    filtered_region_by_region = -np.ones(len(vor.regions), dtype=np.int64)
+    filtered_region_by_region[vor.filtered_region_indices] = np.arange(regions_count)
+    ridge_regions = filtered_region_by_region[vor.point_region[vor.ridge_points]]
+    ridge_vertices = np.array(vor.ridge_vertices, dtype=np.int64).reshape(-1, 2)
+
+    # every edge of a filtered region polygon is a ridge having that region on at least one side
+    polygon_edge = ((ridge_regions >= 0).any(axis=1)) & (ridge_vertices >= 0).all(axis=1)
+    edge_vertices = ridge_vertices[polygon_edge]
+    edge_regions = ridge_regions[polygon_edge]
+    used_vertices = np.unique(edge_vertices)
+    vertices_size = len(vor.vertices)
+
+    vertices_touching_vertex = CsrAdjacency.from_edges(np.concatenate([edge_vertices[:, 0], edge_vertices[:, 1]]),
+                                                       np.concatenate([edge_vertices[:, 1], edge_vertices[:, 0]]),
+                                                       vertices_size, used_vertices)
+    vertex_of_side = np.repeat(edge_vertices.ravel(), 2)
+    region_of_side = np.tile(edge_regions, 2).ravel()
+    inside = region_of_side >= 0
+    regions_touching_vertex = CsrAdjacency.from_edges(vertex_of_side[inside], region_of_side[inside],
+                                                      vertices_size, used_vertices)
+    if edge_neighbours_only:
+        between_regions = (edge_regions >= 0).all(axis=1)
+        regions_touching_region = CsrAdjacency.from_edges(
+            np.concatenate([edge_regions[between_regions, 0], edge_regions[between_regions, 1]]),
+            np.concatenate([edge_regions[between_regions, 1], edge_regions[between_regions, 0]]),
+            regions_count)
+    else:
+        regions_touching_region = _region_neighbours_from_shared_vertices(regions_touching_vertex, regions_count)
+
+    vertices_by_region = _calculate_vertices_by_region(vor.filtered_regions)
+    polygon_by_region = _calculate_polygon_by_region(vor.vertices, vor.filtered_regions, polygon_cache_size)
+    pos_by_vertex = dict(zip(used_vertices.tolist(), map(tuple, vor.vertices[used_vertices].tolist())))
+    point_by_region = np.empty(len(vor.regions), dtype=np.int64)
+    point_by_region[vor.point_region] = np.arange(len(vor.point_region))
+    center_by_region = dict(enumerate(vor.points[point_by_region[vor.filtered_region_indices]]))
+
+    return World(center_by_region, pos_by_vertex, regions_touching_region, vertices_by_region, vertices_touching_vertex,
+                 regions_touching_vertex, polygon_by_region, compact_topology)
 
 
-def convert_to_world(np_vertices_by_region, np_center_by_region, np_vertices):
+def _region_neighbours_from_shared_vertices(regions_touching_vertex: CsrAdjacency, regions_count: int):
+    """
+    Pairs every two regions listed for the same vertex
+    """
+    degrees = regions_touching_vertex.degrees()
+    vertex_of_entry = np.repeat(np.arange(regions_touching_vertex.size), degrees)
+    pairs_per_entry = degrees[vertex_of_entry]
+    first_entry = np.repeat(np.arange(len(vertex_of_entry)), pairs_per_entry)
+    pair_starts = np.cumsum(pairs_per_entry) - pairs_per_entry
+    offset_in_vertex = np.arange(len(first_entry)) - np.repeat(pair_starts, pairs_per_entry)
+    second_entry = regions_touching_vertex.indptr[vertex_of_entry[first_entry]] + offset_in_vertex
+
+    first_regions = regions_touching_vertex.indices[first_entry]
+    second_regions = regions_touching_vertex.indices[second_entry]
+    different = first_regions != second_regions
+    return CsrAdjacency.from_edges(first_regions[different], second_regions[different], regions_count)
+
+
+def _convert_to_world_per_element(np_vertices_by_region, np_center_by_region, np_vertices, compact_topology=True):
     regions_touching_vertex = _calculate_regions_touching_vertex(np_vertices_by_region)
     vertices_by_region = _calculate_vertices_by_region(np_vertices_by_region)
     polygon_by_region = _calculate_polygon_by_region(np_vertices, np_vertices_by_region)
     pos_by_vertex = _calculate_pos_by_vertex(vertices_by_region, np_vertices)
     regions_touching_region = _calculate_region_neighbours(regions_touching_vertex, vertices_by_region)
-    a = set()
-    for vert in np_vertices_by_region:
-        a = a.union(set(vert))
     vertices_touching_vertex = _calculate_neighbouring_vertices(np_vertices_by_region)
-    print("LEN:", len(vertices_touching_vertex))
 
     center_by_region = {k: v for k, v in enumerate(np_center_by_region)}
 
     return World(center_by_region, pos_by_vertex, regions_touching_region, vertices_by_region, vertices_touching_vertex,
-                 regions_touching_vertex, polygon_by_region)
+                 regions_touching_vertex, polygon_by_region, compact_topology)
 
 
 def _calculate_pos_by_vertex(vertices_by_region, np_vertices):
@@ -75,11 +432,13 @@ def _calculate_regions_touching_vertex(np_vertices_by_region):
     return regions_touching_vertex
 
 
-def _calculate_polygon_by_region(np_vertices, np_vertices_by_region):
-    polygon_by_region = {}
-    for region_id, region_vertices in enumerate(np_vertices_by_region):
-        polygon_by_region[region_id] = Polygon(np_vertices[region_vertices, :].tolist())
-    return polygon_by_region
+def _calculate_polygon_by_region(np_vertices, np_vertices_by_region, cache_size=None):
+    region_sizes = np.array([len(region_vertices) for region_vertices in np_vertices_by_region], dtype=np.int64)
+    indptr = np.zeros(len(region_sizes) + 1, dtype=np.int64)
+    np.cumsum(region_sizes, out=indptr[1:])
+    flat_vertices = np.fromiter(itertools.chain.from_iterable(np_vertices_by_region), dtype=np.int64,
+                                count=indptr[-1])
+    return PolygonMapping(np.asarray(np_vertices, dtype=float), indptr, flat_vertices, cache_size)
 
 
 def _calculate_vertices_by_region(np_vertices_by_region):
@@ -110,10 +469,6 @@ def _calculate_neighbouring_vertices(np_vertices_by_region) -> Dict[VertexId, Se
     return neighbouring_vertices
 
 
-def _height_for_the_same_terrain(height_1, height_2):
-    return height_to_terrain(height_1) == height_to_terrain(height_2)
-
-
 class TerrainGroup:
     def __init__(self, terrain_name, group_poly, center_line):
         self.terrain_name = terrain_name
@@ -131,38 +486,33 @@ def height_to_terrain(height):
     return "deep_water"
 
 
+def _height_terrain_codes(heights: np.ndarray) -> np.ndarray:
+    """
+    Vectorized `height_to_terrain`, giving a different integer for every terrain
+    """
+    return np.digitize(heights, [-0.2, 0, MIN_MOUNTAIN_HEIGHT])
+
+
 def merge_heights_into_blobs(world: World):
-    to_visit = set(range(0, world.regions_count))
+    chain_index = GeometryIndex({chain_id: chain.line for chain_id, chain in enumerate(world.mountain_chains)})
+    terrain_by_region = _height_terrain_codes(world.region_array(world.height_by_region))
 
     groups = []
-    while to_visit:
-        region_id = to_visit.pop()
-
-        regions_in_group = set()
-        group_poly = Polygon()
-        neighbours_to_visit = {region_id}
-        first_height = world.height_by_region[region_id]
-        while neighbours_to_visit:
-            neighbour_region = neighbours_to_visit.pop()
-            if neighbour_region not in regions_in_group and _height_for_the_same_terrain(first_height,
-                                                                                         world.height_by_region[
-                                                                                             neighbour_region]):
-                neighbours_to_visit.update(world.regions_touching_region[neighbour_region])
-                group_poly = group_poly.union(world.polygon_by_region[neighbour_region])
-                regions_in_group.add(neighbour_region)
+    component_by_region, sizes = label_components(world.region_graph, terrain_by_region)
+    polygon_by_component = polygons_of_components(component_by_region, len(sizes), world)
+    for regions, group_poly in zip(nodes_by_component(component_by_region, sizes), polygon_by_component):
+        regions_in_group = set(regions.tolist())
+        first_height = world.height_by_region[regions[0]]
 
         # split groups which contain more than one mountain chain
-        intersecting_chains = []
-        for chain in world.mountain_chains:
-            if chain.line.intersects(group_poly):
-                intersecting_chains += [chain.line]
+        intersecting_chains = [world.mountain_chains[chain_id].line
+                               for chain_id in sorted(chain_index.intersecting(group_poly))]
         if len(intersecting_chains) > 1:
             group_polys = _split_intersecting_mountain_chains(intersecting_chains, regions_in_group, world)
         else:
             group_polys = [(group_poly, intersecting_chains[0] if len(intersecting_chains) else None)]
         for group_poly in group_polys:
             groups.append(TerrainGroup(height_to_terrain(first_height), group_poly[0], group_poly[1]))
-        to_visit.difference_update(regions_in_group)
     return groups
 
 
@@ -170,9 +520,9 @@ def _split_intersecting_mountain_chains(intersecting_chains, regions_in_group, w
     distances = {}
     colors = {}
     mountains_to_visit = []
-    for region_id in regions_in_group:
-        for chain_id, chain in enumerate(intersecting_chains):
-            if chain.intersects(world.polygon_by_region[region_id]):
+    for chain_id, chain in enumerate(intersecting_chains):
+        for region_id in world.region_polygon_index().intersecting(chain):
+            if region_id in regions_in_group:
                 distances[region_id] = 0
                 colors[region_id] = chain_id
                 mountains_to_visit += [region_id]
@@ -183,14 +533,12 @@ def _split_intersecting_mountain_chains(intersecting_chains, regions_in_group, w
         for n in neighbours:
             distances[n] = distances[region_id] + 1
             colors[n] = colors[region_id]
-    regions_in_subgroups = itertools.groupby(colors.items(), key=lambda x: x[1])
-    group_polys = []
-    for subgroup_id, regions in regions_in_subgroups:
-        next_group_poly = Polygon()
-        for r in [r[0] for r in regions]:
-            next_group_poly = next_group_poly.union(world.polygon_by_region[r])
-        group_polys += [(next_group_poly, intersecting_chains[subgroup_id])]
-    return group_polys
+    color_by_region = np.full(world.regions_count, -1, dtype=np.int64)
+    color_by_region[list(colors.keys())] = list(colors.values())
+    polygon_by_color = polygons_of_components(color_by_region, len(intersecting_chains), world)
+    used_colors = set(colors.values())
+    return [(polygon_by_color[chain_id], chain) for chain_id, chain in enumerate(intersecting_chains)
+            if chain_id in used_colors]
 
 
 class ChainDescriptor:
@@ -209,7 +557,7 @@ def walk_over_regions(initial_regions: Iterable[RegionId], predicate: Callable[[
     found = set(initial_regions)
     while to_visit:
         current_region = to_visit.pop()
-        neighbours_fulfilling_predicate = [r for r in world.regions_touching_region[current_region] if
+        neighbours_fulfilling_predicate = [r for r in world.region_graph.neighbours(current_region).tolist() if
                                            predicate(r) and r not in found]
         found.update(neighbours_fulfilling_predicate)
         to_visit.update(neighbours_fulfilling_predicate)
@@ -222,7 +570,7 @@ def walk_over_vertices(initial_vertices: Iterable[VertexId], predicate: Callable
     found = set()
     while to_visit:
         current_vertex = to_visit.pop()
-        neighbours_fulfilling_predicate = [r for r in world.vertices_touching_vertex[current_vertex] if
+        neighbours_fulfilling_predicate = [r for r in world.vertex_graph.neighbours(current_vertex).tolist() if
                                            predicate(r) and r not in found]
         found.update(neighbours_fulfilling_predicate)
         to_visit.update(neighbours_fulfilling_predicate)
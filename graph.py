@@ -0,0 +1,253 @@
+import itertools
+from collections.abc import Mapping
+from typing import Dict, Iterable, List
+
+import numpy as np
+import scipy.sparse
+import scipy.sparse.csgraph
+
+import profiling
+
+
+class CsrAdjacency:
+    """
+    Compact adjacency stored as numpy CSR arrays.
+    Neighbours of `node` are `indices[indptr[node]:indptr[node + 1]]`.
+    Node ids don't need to be contiguous, `nodes` keeps the ids which are really present in the graph.
+    """
+
+    def __init__(self, indptr: np.ndarray, indices: np.ndarray, nodes: np.ndarray = None):
+        self.indptr = indptr
+        self.indices = indices
+        self.size = len(indptr) - 1
+        self.nodes = np.arange(self.size) if nodes is None else nodes
+
+    @classmethod
+    def from_mapping(cls, neighbours_by_node: Dict[int, Iterable[int]], size: int = None):
+        if isinstance(neighbours_by_node, CsrAdjacency):
+            return neighbours_by_node
+        if isinstance(neighbours_by_node, AdjacencyView):
+            return neighbours_by_node.graph
+        nodes = np.array(sorted(neighbours_by_node.keys()), dtype=np.int64)
+        if size is None:
+            size = int(nodes[-1]) + 1 if len(nodes) else 0
+        degrees = np.zeros(size, dtype=np.int64)
+        for node, neighbours in neighbours_by_node.items():
+            degrees[node] = len(neighbours)
+        indptr = np.zeros(size + 1, dtype=np.int64)
+        np.cumsum(degrees, out=indptr[1:])
+        indices = np.empty(indptr[-1], dtype=np.int64)
+        for node, neighbours in neighbours_by_node.items():
+            indices[indptr[node]:indptr[node + 1]] = sorted(neighbours)
+        return cls(indptr, indices, nodes)
+
+    @classmethod
+    def from_edges(cls, sources: np.ndarray, targets: np.ndarray, size: int, nodes: np.ndarray = None):
+        """
+        Build the graph from directed edges. Duplicated edges are removed and neighbours are sorted.
+        """
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        max_target = int(targets.max()) + 1 if len(targets) else 1
+        keys = np.unique(sources * max_target + targets)
+        sources, targets = keys // max_target, keys % max_target
+        indptr = np.zeros(size + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=size), out=indptr[1:])
+        return cls(indptr, targets, nodes)
+
+    def neighbours(self, node: int) -> np.ndarray:
+        return self.indices[self.indptr[node]:self.indptr[node + 1]]
+
+    def degrees(self) -> np.ndarray:
+        return np.diff(self.indptr)
+
+    def edges(self):
+        """
+        :return: arrays of sources and targets of all directed edges
+        """
+        return np.repeat(np.arange(self.size), self.degrees()), self.indices
+
+    def edges_from(self, nodes: np.ndarray):
+        """
+        :return: arrays of sources and targets of all directed edges leaving `nodes`
+        """
+        starts = self.indptr[nodes]
+        degrees = self.indptr[nodes + 1] - starts
+        offsets = np.arange(degrees.sum()) - np.repeat(np.cumsum(degrees) - degrees, degrees)
+        return np.repeat(nodes, degrees), self.indices[np.repeat(starts, degrees) + offsets]
+
+    def to_dict(self):
+        indptr = self.indptr.tolist()
+        indices = self.indices.tolist()
+        return {node: set(indices[indptr[node]:indptr[node + 1]]) for node in self.nodes.tolist()}
+
+    def view(self):
+        return AdjacencyView(self)
+
+
+class AdjacencyView(Mapping):
+    """
+    Read-only dict-of-sets view over CsrAdjacency
+    """
+
+    def __init__(self, graph: CsrAdjacency):
+        self.graph = graph
+        self._present = np.zeros(graph.size, dtype=bool)
+        self._present[graph.nodes] = True
+
+    def __getitem__(self, node):
+        if not 0 <= node < self.graph.size or not self._present[node]:
+            raise KeyError(node)
+        return frozenset(self.graph.neighbours(node).tolist())
+
+    def __contains__(self, node):
+        return isinstance(node, (int, np.integer)) and 0 <= node < self.graph.size and bool(self._present[node])
+
+    def __iter__(self):
+        return iter(self.graph.nodes.tolist())
+
+    def __len__(self):
+        return len(self.graph.nodes)
+
+
+class Incidence:
+    """
+    Sparse region x vertex incidence matrix aggregating values of vertices into their regions and back
+    """
+
+    def __init__(self, indptr: np.ndarray, vertices: np.ndarray, vertices_size: int):
+        self.indptr = indptr
+        self.vertices = vertices
+        self.regions_count = len(indptr) - 1
+        self.vertices_size = vertices_size
+        self.region_of_entry = np.repeat(np.arange(self.regions_count), np.diff(indptr))
+        self.matrix = scipy.sparse.csr_matrix((np.ones(len(vertices)), vertices, indptr),
+                                              shape=(self.regions_count, vertices_size))
+
+    @classmethod
+    def from_mapping(cls, vertices_by_region: Dict[int, Iterable[int]], vertices_size: int):
+        regions = sorted(vertices_by_region.keys())
+        sizes = np.array([len(vertices_by_region[region]) for region in regions], dtype=np.int64)
+        indptr = np.zeros(len(regions) + 1, dtype=np.int64)
+        np.cumsum(sizes, out=indptr[1:])
+        vertices = np.fromiter(itertools.chain.from_iterable(vertices_by_region[region] for region in regions),
+                               dtype=np.int64, count=indptr[-1])
+        return cls(indptr, vertices, vertices_size)
+
+    def mean(self, vertex_values: np.ndarray) -> np.ndarray:
+        return self.matrix @ vertex_values / np.diff(self.indptr)
+
+    def max(self, vertex_values: np.ndarray) -> np.ndarray:
+        return np.maximum.reduceat(vertex_values[self.vertices], self.indptr[:-1])
+
+    def majority(self, vertex_codes: np.ndarray, categories_count: int) -> np.ndarray:
+        """
+        The most frequent of integer codes (from 0 to categories_count - 1) among vertices of every region.
+        Ties are resolved in favour of the lowest code.
+        """
+        votes = np.bincount(self.region_of_entry * categories_count + vertex_codes[self.vertices],
+                            minlength=self.regions_count * categories_count)
+        return votes.reshape(self.regions_count, categories_count).argmax(axis=1)
+
+    def scatter(self, region_values: np.ndarray, reduce: str = "max", fill=np.nan) -> np.ndarray:
+        """
+        Values of regions reduced onto every vertex touching them
+        :param reduce: "max", "min" or "mean"
+        """
+        values = region_values[self.region_of_entry]
+        if reduce == "mean":
+            counts = np.bincount(self.vertices, minlength=self.vertices_size)
+            sums = np.bincount(self.vertices, weights=values, minlength=self.vertices_size)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                return np.where(counts > 0, sums / counts, fill)
+        if reduce not in ("max", "min"):
+            raise ValueError("reduce must be one of 'max', 'min' or 'mean'")
+        reduce_ufunc = np.maximum if reduce == "max" else np.minimum
+        result = np.full(self.vertices_size, np.inf if reduce == "min" else -np.inf)
+        reduce_ufunc.at(result, self.vertices, values)
+        result[np.bincount(self.vertices, minlength=self.vertices_size) == 0] = fill
+        return result
+
+
+def propagate_decay(graph: CsrAdjacency, sources, source_values, factor: float,
+                    floor: float = None, cutoff: float = None) -> np.ndarray:
+    """
+    Spreads values from `sources` over the graph, multiplying them by `factor` (< 1) on every hop.
+    Every node keeps the max of values reaching it.
+    The sweep processes all edges leaving the current frontier at once, the frontier being nodes whose
+    value has just improved. If all sources have equal values, every node is in the frontier only once.
+    :param floor: propagated values don't drop below it, so all reachable nodes get at least `floor`
+    :param cutoff: values lower than it are not propagated
+    :return: array of values indexed by node, -inf for nodes which weren't reached
+    """
+    values = np.full(graph.size, -np.inf)
+    sources = np.asarray(sources, dtype=np.int64)
+    np.maximum.at(values, sources, np.broadcast_to(np.asarray(source_values, dtype=float), sources.shape))
+    frontier = np.unique(sources)
+    while len(frontier):
+        profiling.count("graph_nodes_visited", len(frontier))
+        edge_sources, edge_targets = graph.edges_from(frontier)
+        candidates = values[edge_sources] * factor
+        if floor is not None:
+            candidates = np.maximum(candidates, floor)
+        improving = candidates > values[edge_targets]
+        if cutoff is not None:
+            improving &= candidates >= cutoff
+        edge_targets = edge_targets[improving]
+        np.maximum.at(values, edge_targets, candidates[improving])
+        frontier = np.unique(edge_targets)
+    return values
+
+
+def reachable(graph: CsrAdjacency, sources, allowed: np.ndarray) -> np.ndarray:
+    """
+    Nodes reachable from `sources` through nodes for which `allowed` is True. Sources are always included.
+    :return: boolean mask indexed by node
+    """
+    found = np.zeros(graph.size, dtype=bool)
+    frontier = np.unique(np.asarray(sources, dtype=np.int64))
+    found[frontier] = True
+    while len(frontier):
+        profiling.count("graph_nodes_visited", len(frontier))
+        _, edge_targets = graph.edges_from(frontier)
+        edge_targets = edge_targets[allowed[edge_targets] & ~found[edge_targets]]
+        frontier = np.unique(edge_targets)
+        found[frontier] = True
+    return found
+
+
+def label_components(graph: CsrAdjacency, labels: np.ndarray = None, mask: np.ndarray = None):
+    """
+    Connected components of the graph restricted to edges between nodes having equal `labels`
+    and to nodes for which `mask` is True.
+    :return: array of component ids indexed by node (-1 for nodes excluded by the mask or absent in the graph)
+    and array of sizes of the components
+    """
+    profiling.count("graph_nodes_visited", len(graph.nodes))
+    sources, targets = graph.edges()
+    included = np.zeros(graph.size, dtype=bool)
+    included[graph.nodes] = True
+    if mask is not None:
+        included &= mask
+    kept_edges = included[sources] & included[targets]
+    if labels is not None:
+        kept_edges &= labels[sources] == labels[targets]
+    adjacency = scipy.sparse.csr_matrix((np.ones(kept_edges.sum(), dtype=np.int8),
+                                         (sources[kept_edges], targets[kept_edges])),
+                                        shape=(graph.size, graph.size))
+    _, component_by_node = scipy.sparse.csgraph.connected_components(adjacency, directed=False)
+
+    # renumber components so that excluded nodes don't get any
+    component_ids, component_by_included_node = np.unique(component_by_node[included], return_inverse=True)
+    component_by_node = np.full(graph.size, -1, dtype=np.int64)
+    component_by_node[included] = component_by_included_node
+    return component_by_node, np.bincount(component_by_included_node, minlength=len(component_ids))
+
+
+def nodes_by_component(component_by_node: np.ndarray, sizes: np.ndarray) -> List[np.ndarray]:
+    """
+    Splits nodes labeled by `label_components` into a list of arrays of nodes of every component
+    """
+    labeled = np.flatnonzero(component_by_node >= 0)
+    ordered = labeled[np.argsort(component_by_node[labeled], kind="stable")]
+    return np.split(ordered, np.cumsum(sizes)[:-1])
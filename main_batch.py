@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+import argparse
+import hashlib
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+from os import path, makedirs
+
+import storage
+from pipeline import Pipeline
+from profiling import Profiler
+from world_generation import stages
+
+bounding_box = [(0, 1), (0, 1)]
+
+
+def generate_map(seed, number_of_points, cache_dir, output_dir):
+    """
+    Runs the whole pipeline for a single seed, it's executed in a worker process.
+    Only the shared mesh is cached, outputs of the seeded stages would take tens of MB for every seed.
+    :return: entry of the manifest describing the map
+    """
+    start = time.time()
+    # tracing memory would slow all workers down, peak memory is measured by main_map
+    profiler = Profiler(trace_memory=False)
+    map_stages = stages.map_stages(number_of_points, bounding_box)
+    for stage in map_stages:
+        stage.cache = stage.name in stages.MESH_STAGES
+    pipeline = Pipeline(map_stages, seed, cache_dir, profiler)
+    entry = {"seed": seed, "number_of_points": number_of_points}
+    try:
+        world = pipeline.run()
+        file_name = path.join(output_dir, "generated_map_{}_{}".format(number_of_points, seed))
+        storage.save_world(world, file_name)
+        entry["file"] = file_name
+    except Exception as error:
+        # a failure of a single seed mustn't abort the whole batch
+        entry["error"] = _error_description(error)
+    entry["hash_by_stage"] = pipeline.hash_by_stage
+    entry["cached_stages"] = pipeline.cached_stages
+    entry["seconds_by_stage"] = pipeline.seconds_by_stage
+    entry["profile"] = profiler.to_dict()
+    entry["seconds"] = time.time() - start
+    return entry
+
+
+def generate_maps(seeds, number_of_points, workers=None, cache_dir="dumps/stages", output_dir="dumps"):
+    """
+    Generates a map for every seed in a pool of processes and writes a manifest of them to `output_dir`.
+    The shared mesh is generated first, so workers only load it from the cache.
+    """
+    start = time.time()
+    makedirs(output_dir, exist_ok=True)
+    mesh_pipeline = Pipeline(stages.map_stages(number_of_points, bounding_box), seeds[0], cache_dir)
+    last_mesh_stage = mesh_pipeline.stages[len(stages.MESH_STAGES) - 1]
+    if not path.exists(mesh_pipeline.cache_path(last_mesh_stage)):
+        mesh_pipeline.run(until=last_mesh_stage.name)
+
+    maps = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(generate_map, seed, number_of_points, cache_dir, output_dir) for seed in seeds]
+        for seed, future in zip(seeds, futures):
+            try:
+                maps.append(future.result())
+            except Exception as error:
+                # the worker died or its entry couldn't be sent back
+                maps.append({"seed": seed, "number_of_points": number_of_points, "error": _error_description(error)})
+
+    manifest = {
+        "number_of_points": number_of_points,
+        "mesh_seconds_by_stage": mesh_pipeline.seconds_by_stage,
+        "seconds": time.time() - start,
+        "maps": maps,
+    }
+    seeds_hash = hashlib.sha256(json.dumps(seeds).encode()).hexdigest()[:8]
+    manifest_name = path.join(output_dir, "manifest_{}_{}_{}.json".format(number_of_points, time.time_ns(), seeds_hash))
+    with open(manifest_name, "x") as file:
+        json.dump(manifest, file, indent=2)
+    return manifest_name
+
+
+def _error_description(error: Exception) -> str:
+    return "{}: {}".format(type(error).__name__, error)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate maps for many seeds in parallel")
+    parser.add_argument("seeds", type=int, nargs="+")
+    parser.add_argument("--points", type=int, default=25000)
+    parser.add_argument("--workers", type=int, default=None, help="number of processes, all CPUs by default")
+    args = parser.parse_args()
+
+    manifest_file = generate_maps(args.seeds, args.points, args.workers)
+    print("Manifest written to", manifest_file)
@@ -1,53 +1,29 @@
 #!/usr/bin/env python
-import random
 import shutil
 import time
-import pickle
-from os import path
 
-import data
-import plot
-import world_generation
+import raster
+import storage
 from checkpoint import time_from_last_checkpoint
-from world_generation import voronoi, mountain_chains, heightmap, rivers, terrains, fixes, clustering
+from pipeline import Pipeline
+from profiling import Profiler
+from world_generation import stages
 
 start = time.time()
 
 number_of_points = 25000
 bounding_box = [(0, 1), (0, 1)]
+# outputs of stages are cached for the given seed, change it to get a different map
+seed = 0
+# directory to dump cProfile stats of every stage to, e.g. "dumps/cprofile"
+cprofile_dir = None
 
 checkpoint = time_from_last_checkpoint()
 next(checkpoint)
 
-if not path.exists("dumps/world_post_voronoi_" + str(number_of_points)):
-    print("No cached voronoi found. Generating it...")
-    voronoi_diag = voronoi.relaxed_voronoi(number_of_points, bounding_box, 8)
-    print("voronoi", next(checkpoint))
-
-    world = data.convert_to_world(voronoi_diag.filtered_regions, voronoi_diag.filtered_points, voronoi_diag.vertices)
-    print("conversion", next(checkpoint))
-    pickle.dump(world, open("dumps/world_post_voronoi_" + str(number_of_points), "wb"))
-else:
-    world = pickle.load(open("dumps/world_post_voronoi_" + str(number_of_points), "rb"))
-
-world_generation.mountain_chains.create_mountain_chains(11, world)
-world_generation.heightmap.create_heightmap(world)
-print("heightmap", next(checkpoint))
-
-world_generation.rivers.generate_rivers(17, world)
-print("rivers", next(checkpoint))
-
-world_generation.terrains.generate_terrains(world)
-print("terrains", next(checkpoint))
-
-world_generation.fixes.remove_artifacts_before_clustering(world)
-print("remove_artifacts_before_clustering", next(checkpoint))
-
-world_generation.clustering.cluster_terrains(world)
-print("clustering", next(checkpoint))
-
-world_generation.fixes.remove_artifacts_after_clustering(world)
-print("remove_artifacts_after_clustering", next(checkpoint))
+profiler = Profiler(cprofile_dir=cprofile_dir)
+world = Pipeline(stages.map_stages(number_of_points, bounding_box), seed, profiler=profiler).run()
+next(checkpoint)
 
 # dump = exporter.export(world.terrain_blobs)
 
@@ -55,14 +31,17 @@ print("remove_artifacts_after_clustering", next(checkpoint))
 #     file.write(dump)
 # print("export", next(checkpoint))
 
-plot.plot_map(world, True)
+# plot.plot_map(world, True) draws the same map with matplotlib
+with profiler.stage("plot"):
+    raster.save_png(raster.render_map(world, size=2000), "map.png")
 print("plot", next(checkpoint))
 
-file_id = random.randint(0, 1000000)
+file_id = seed
 file_name = "generated_map_{}_{}".format(number_of_points, file_id)
 shutil.copyfile("map.png", "rendered_maps/" + file_name)
 
 print("Generated map with name generated_map_" + str(number_of_points) + "_" + str(file_id))
-pickle.dump(world, open("dumps/" + file_name, "wb"))
+storage.save_world(world, "dumps/" + file_name)
+profiler.save("dumps/profile_{}_{}.json".format(number_of_points, file_id))
 
 print("Finished in {} seconds".format(time.time() - start))
@@ -1,13 +1,12 @@
 #!/usr/bin/env python
-import pickle
-
 from shapely.geometry import Point
 
 import plot
+import storage
 from checkpoint import time_from_last_checkpoint
 
 file_name = "generated_map_25000_38257"
-world = pickle.load(open("dumps/" + file_name, "rb"))
+world = storage.load_world("dumps/" + file_name)
 
 background_image = "rendered_maps/" + file_name
 
@@ -0,0 +1,14 @@
+#!/usr/bin/env python
+import tiles
+import storage
+from checkpoint import time_from_last_checkpoint
+
+file_name = "generated_map_25000_0"
+max_zoom = 5
+
+checkpoint = time_from_last_checkpoint()
+next(checkpoint)
+
+world = storage.load_world("dumps/" + file_name)
+tiles_count = tiles.render_tiles(world, "rendered_maps/tiles/" + file_name, max_zoom)
+print("tiles", tiles_count, next(checkpoint))
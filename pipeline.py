@@ -0,0 +1,222 @@
+import functools
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import random
+import tempfile
+from contextlib import nullcontext
+from os import path, makedirs
+from typing import Callable, Dict, List, Set
+
+import numpy as np
+
+from checkpoint import time_from_last_checkpoint
+from profiling import Profiler
+
+# modules within this directory are fingerprinted in cache keys of stages
+PROJECT_DIR = path.dirname(path.abspath(__file__))
+
+
+class Stage:
+    def __init__(self, name: str, function: Callable, inputs: Dict[str, str] = None, params: Dict = None,
+                 rng: str = None, seeded: bool = True, version: int = 0, cache: bool = True):
+        """
+        Step of the generation, e.g. creating the heightmap.
+        :param function: called with outputs of the input stages and the params as keyword arguments.
+        A function returning None modifies its only input in place and that input becomes the output of the stage.
+        :param inputs: name of an argument of the function -> name of the stage whose output is passed there
+        :param params: other keyword arguments of the function, they must be serializable to JSON
+        :param rng: "python" or "numpy" to pass a random generator of the stage as `rng` argument of the function
+        :param seeded: when False the stage doesn't depend on the seed of the pipeline,
+        so its output is shared by pipelines with different seeds, e.g. the Voronoi mesh
+        :param version: part of the cache key, to be increased when something outside of the project code
+        changes the output, e.g. a data file read by the function
+        :param cache: when False the output is neither stored in nor loaded from the cache,
+        the stage is executed whenever it's needed
+        """
+        if rng not in (None, "python", "numpy"):
+            raise ValueError("rng must be either 'python' or 'numpy'")
+        self.name = name
+        self.function = function
+        self.inputs = inputs or {}
+        self.params = params or {}
+        self.rng = rng
+        self.seeded = seeded
+        self.version = version
+        self.cache = cache
+
+
+class Pipeline:
+    def __init__(self, stages: List[Stage], seed: int, cache_dir: str = "dumps/stages",
+                 profiler: Profiler = None):
+        """
+        Runs stages in the given order, storing the output of every stage in `cache_dir`
+        under a hash of its name, params, seed, sources of the project modules its function depends on
+        and hashes of its inputs.
+        A stage is executed only when its output is not cached yet, so changing params of a stage
+        reruns only that stage and the stages depending on it.
+        Before every stage the random generators are reseeded with a seed derived from the stage name,
+        so the output of a stage is the same whether the previous stages were executed or loaded.
+        Stages declaring `rng` get their own generator seeded the same way instead of relying on the global state.
+        :param profiler: optional profiler recording every executed or loaded stage
+        """
+        self.stages = stages
+        self.seed = seed
+        self.cache_dir = cache_dir
+        self.profiler = profiler
+        self.hash_by_stage: Dict[str, str] = {}
+        self.cached_stages: List[str] = []
+        self.seconds_by_stage: Dict[str, float] = {}
+        stage_names = set()
+        for stage in stages:
+            missing_inputs = set(stage.inputs.values()) - stage_names
+            if missing_inputs:
+                raise ValueError("stage '{}' depends on stages which are not before it: {}"
+                                 .format(stage.name, ", ".join(sorted(missing_inputs))))
+            stage_names.add(stage.name)
+            self.hash_by_stage[stage.name] = self._stage_hash(stage)
+
+    def _stage_hash(self, stage: Stage) -> str:
+        description = json.dumps({
+            "name": stage.name,
+            "params": stage.params,
+            "seed": self.seed if stage.seeded else None,
+            "code": _code_fingerprint(stage.function),
+            "version": stage.version,
+            "inputs": {argument: self.hash_by_stage[input_stage] for argument, input_stage in stage.inputs.items()},
+        }, sort_keys=True, default=lambda value: getattr(value, "__qualname__", repr(value)))
+        return hashlib.sha256(description.encode()).hexdigest()[:16]
+
+    def stage_seed(self, stage: Stage) -> int:
+        seed = self.seed if stage.seeded else None
+        return int(hashlib.sha256("{}:{}".format(seed, stage.name).encode()).hexdigest()[:8], 16)
+
+    def cache_path(self, stage: Stage) -> str:
+        return path.join(self.cache_dir, "{}_{}.pickle".format(stage.name, self.hash_by_stage[stage.name]))
+
+    def run(self, until: str = None, force: bool = False):
+        """
+        :param until: name of the last stage to run, all stages by default
+        :param force: execute all stages even if they are cached
+        :return: output of the last stage
+        """
+        makedirs(self.cache_dir, exist_ok=True)
+        stages = self.stages
+        if until is not None:
+            stages = stages[:[stage.name for stage in stages].index(until) + 1]
+
+        needed = {stages[-1].name}
+        for stage in reversed(stages):
+            if stage.name in needed and not self._is_cached(stage, force):
+                needed.update(stage.inputs.values())
+
+        checkpoint = time_from_last_checkpoint()
+        next(checkpoint)
+        output_by_stage = {}
+        for stage in stages:
+            if stage.name not in needed:
+                continue
+            cache_path = self.cache_path(stage)
+            if self._is_cached(stage, force):
+                with self._profiled(stage) as profile:
+                    with open(cache_path, "rb") as cache_file:
+                        output_by_stage[stage.name] = pickle.load(cache_file)
+                    if profile:
+                        profile.cached = True
+                self.cached_stages.append(stage.name)
+                print(stage.name, "loaded from cache", next(checkpoint))
+                continue
+
+            with self._profiled(stage):
+                output_by_stage[stage.name] = self._execute(stage, output_by_stage)
+            self.seconds_by_stage[stage.name] = next(checkpoint)
+            print(stage.name, self.seconds_by_stage[stage.name])
+
+            if stage.cache:
+                _dump_atomically(output_by_stage[stage.name], cache_path)
+                next(checkpoint)
+        return output_by_stage[stages[-1].name]
+
+    def _is_cached(self, stage: Stage, force: bool) -> bool:
+        return stage.cache and not force and path.exists(self.cache_path(stage))
+
+    def _profiled(self, stage: Stage):
+        return self.profiler.stage(stage.name) if self.profiler else nullcontext()
+
+    def _execute(self, stage: Stage, output_by_stage):
+        stage_seed = self.stage_seed(stage)
+        random.seed(stage_seed)
+        np.random.seed(stage_seed)
+        arguments = {argument: output_by_stage[input_stage] for argument, input_stage in stage.inputs.items()}
+        params = dict(stage.params)
+        if stage.rng == "python":
+            params["rng"] = random.Random(stage_seed)
+        elif stage.rng == "numpy":
+            params["rng"] = np.random.default_rng(stage_seed)
+        output = stage.function(**arguments, **params)
+        if output is None:
+            if len(arguments) != 1:
+                raise ValueError("stage '{}' returned nothing and has no single input to be its output"
+                                 .format(stage.name))
+            output = next(iter(arguments.values()))
+        return output
+
+
+def _code_fingerprint(function: Callable) -> str:
+    """
+    Hash of the sources of the project modules the function depends on: the module defining it
+    and all project modules imported by it, transitively. Editing any of them invalidates cached outputs of the stage.
+    """
+    module = inspect.getmodule(function)
+    if module is None or not _is_project_module(module):
+        return hashlib.sha256(getattr(function, "__qualname__", repr(function)).encode()).hexdigest()[:16]
+    fingerprint = hashlib.sha256()
+    for dependency in sorted(_project_dependencies(module), key=lambda dependency: dependency.__name__):
+        fingerprint.update(dependency.__name__.encode())
+        fingerprint.update(_source_hash(dependency.__file__))
+    return fingerprint.hexdigest()[:16]
+
+
+def _project_dependencies(module, found=None) -> Set:
+    """
+    The module and project modules it uses, either imported as modules or through names imported from them
+    """
+    found = set() if found is None else found
+    found.add(module)
+    for value in list(vars(module).values()):
+        dependency = value if inspect.ismodule(value) else inspect.getmodule(value)
+        if dependency is not None and dependency not in found and _is_project_module(dependency):
+            _project_dependencies(dependency, found)
+    return found
+
+
+def _is_project_module(module) -> bool:
+    file_name = getattr(module, "__file__", None)
+    return file_name is not None and path.abspath(file_name).startswith(PROJECT_DIR + os.sep)
+
+
+@functools.lru_cache(maxsize=None)
+def _source_hash(file_name: str) -> bytes:
+    with open(file_name, "rb") as source_file:
+        return hashlib.sha256(source_file.read()).digest()
+
+
+def _dump_atomically(output, cache_path: str):
+    """
+    Pickles the output into a temporary file which replaces the cache file only when it's complete,
+    so an interrupted run doesn't leave a truncated cache file
+    """
+    descriptor, temporary_path = tempfile.mkstemp(dir=path.dirname(cache_path), suffix=".tmp")
+    try:
+        with os.fdopen(descriptor, "wb") as cache_file:
+            pickle.dump(output, cache_file)
+        # mkstemp creates files readable only by the owner, cache files get the usual permissions
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(temporary_path, 0o666 & ~umask)
+        os.replace(temporary_path, cache_path)
+    except BaseException:
+        os.remove(temporary_path)
+        raise
@@ -0,0 +1,118 @@
+import cProfile
+import json
+import mmap
+import time
+import tracemalloc
+from contextlib import contextmanager
+from os import path, makedirs
+from typing import Dict, List
+
+# profile of the stage which counters are reported to, None when no stage is profiled
+_active_profile = None
+# traced peaks of memory of the stages being profiled, from before nested stages reset the peak
+_peaks_before_reset: List[int] = []
+
+
+def count(counter: str, amount: int = 1):
+    """
+    Adds `amount` to a counter of the stage being profiled, e.g. the number of visited graph nodes.
+    It does nothing when nothing is profiled, so it can be called from hot paths.
+    """
+    if _active_profile is not None:
+        _active_profile.counters[counter] = _active_profile.counters.get(counter, 0) + amount
+
+
+class StageProfile:
+    def __init__(self, name: str):
+        self.name = name
+        self.wall_seconds: float = None
+        self.cpu_seconds: float = None
+        # peak of memory allocated by Python during the stage, when memory is traced and the peak can be measured
+        self.peak_memory_bytes: int = None
+        # change of resident set size of the whole process
+        self.rss_delta_bytes: int = None
+        self.counters: Dict[str, int] = {}
+        self.cached = False
+
+    def to_dict(self):
+        return dict(self.__dict__)
+
+
+class Profiler:
+    def __init__(self, trace_memory: bool = True, cprofile_dir: str = None):
+        """
+        Collects a StageProfile of every stage run within `stage()`. Stages can be nested,
+        but on Python < 3.9 peak memory of the nested stages is not measured.
+        :param trace_memory: measure peak memory with tracemalloc, which slows the allocations down noticeably
+        :param cprofile_dir: when given, cProfile stats of every stage are dumped there as <stage>.prof
+        """
+        self.trace_memory = trace_memory
+        self.cprofile_dir = cprofile_dir
+        self.stages: List[StageProfile] = []
+
+    @contextmanager
+    def stage(self, name: str):
+        global _active_profile
+        profile = StageProfile(name)
+        previous_profile = _active_profile
+        _active_profile = profile
+
+        started_tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        # the peak can be measured when it can be reset or when tracing starts with this stage,
+        # Python < 3.9 has no `reset_peak`, so there peaks of nested stages are not available
+        measure_peak = self.trace_memory and (started_tracing or hasattr(tracemalloc, "reset_peak"))
+        if measure_peak:
+            if not started_tracing:
+                # keep peaks of enclosing stages before resetting it
+                peak = tracemalloc.get_traced_memory()[1]
+                _peaks_before_reset[:] = [max(previous_peak, peak) for previous_peak in _peaks_before_reset]
+                tracemalloc.reset_peak()
+            _peaks_before_reset.append(0)
+            memory_at_start = tracemalloc.get_traced_memory()[0]
+        profiler = None
+        if self.cprofile_dir is not None:
+            profiler = cProfile.Profile()
+        rss_at_start = _rss_bytes()
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        if profiler:
+            profiler.enable()
+        try:
+            yield profile
+        finally:
+            if profiler:
+                profiler.disable()
+            profile.wall_seconds = time.perf_counter() - wall_start
+            profile.cpu_seconds = time.process_time() - cpu_start
+            rss_at_end = _rss_bytes()
+            if rss_at_start is not None and rss_at_end is not None:
+                profile.rss_delta_bytes = rss_at_end - rss_at_start
+            if measure_peak:
+                peak = max(_peaks_before_reset.pop(), tracemalloc.get_traced_memory()[1])
+                profile.peak_memory_bytes = peak - memory_at_start
+            if started_tracing:
+                tracemalloc.stop()
+            if profiler:
+                makedirs(self.cprofile_dir, exist_ok=True)
+                profiler.dump_stats(path.join(self.cprofile_dir, name + ".prof"))
+            _active_profile = previous_profile
+            self.stages.append(profile)
+
+    def to_dict(self):
+        return {"stages": [stage.to_dict() for stage in self.stages]}
+
+    def save(self, file_name: str):
+        with open(file_name, "w") as file:
+            json.dump(self.to_dict(), file, indent=2)
+
+
+def _rss_bytes():
+    """
+    Current resident set size of the process, None where /proc is not available
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * mmap.PAGESIZE
+    except OSError:
+        return None
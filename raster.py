@@ -0,0 +1,169 @@
+from typing import List, Tuple
+
+import matplotlib.colors
+import matplotlib.image as mpimg
+import numpy as np
+from shapely.geometry import LineString
+
+import data
+from plot import COLOR_BY_TERRAIN, sort_order
+
+# widths of lines in points of the 1 inch figure drawn by `plot.plot_map`, the figure spans the whole map
+MOUNTAIN_CHAIN_WIDTH = 0.3
+RIVER_WIDTH = 0.15
+MOUNTAIN_CHAIN_COLOR = "purple"
+RIVER_COLOR = "blue"
+
+# number of pixel rows rasterized at once, it bounds the memory needed for a single shape
+ROWS_PER_BLOCK = 256
+
+Bounds = Tuple[Tuple[float, float], Tuple[float, float]]
+Shape = Tuple[object, Tuple[float, float, float, float]]
+
+
+def map_shapes(world: data.World) -> List[Shape]:
+    """
+    Polygons and their RGBA colors in the order in which `plot.plot_map` draws them:
+    clusters by `sort_order`, mountain chains and rivers. Lines are turned into polygons of their width.
+    """
+    shapes = [(cluster.polygon, matplotlib.colors.to_rgba(COLOR_BY_TERRAIN[cluster.terrain_type]))
+              for cluster in sorted(world.clusters, key=lambda cluster: sort_order[cluster.terrain_type])]
+    shapes += [(_line_polygon(chain.line, MOUNTAIN_CHAIN_WIDTH), matplotlib.colors.to_rgba(MOUNTAIN_CHAIN_COLOR))
+               for chain in world.mountain_chains]
+    shapes += [(_line_polygon(LineString([world.pos_by_vertex[vertex] for vertex in river]), RIVER_WIDTH),
+                matplotlib.colors.to_rgba(RIVER_COLOR)) for river in world.rivers]
+    return shapes
+
+
+def _line_polygon(line: LineString, width_in_points: float):
+    # square caps and round joins, like lines drawn by matplotlib
+    return line.buffer(width_in_points / 72 / 2, cap_style=3, join_style=1)
+
+
+def render_map(world: data.World, size: int = 2000, antialiasing: int = 4) -> np.ndarray:
+    """
+    Renders clusters, mountain chains and rivers without matplotlib figures, see `render_shapes`
+    :param size: width and height of the image in pixels
+    """
+    return render_shapes(map_shapes(world), size, size, ((0, 1), (0, 1)), antialiasing)
+
+
+def render_shapes(shapes: List[Shape], width: int, height: int, bounds: Bounds, antialiasing: int = 4) -> np.ndarray:
+    """
+    Scanline rasterization of polygons (with holes) into an RGBA image, drawing them in the given order
+    and blending translucent colors over the shapes below.
+    Coverage of pixels is exact horizontally and sampled by `antialiasing` scanlines per pixel row vertically.
+    :param bounds: ((min_x, max_x), (min_y, max_y)) of the area covered by the image
+    :param antialiasing: number of scanlines per pixel row, 1 disables antialiasing
+    :return: uint8 array of shape (height, width, 4)
+    """
+    (min_x, max_x), (min_y, max_y) = bounds
+    scale = np.array([width / (max_x - min_x), -height / (max_y - min_y)])
+    offset = np.array([min_x, max_y])
+    # premultiplied colors, one plane per channel
+    canvas = np.zeros((4, height, width), dtype=np.float32)
+    for geometry, color in shapes:
+        edges = _edges_in_pixels(geometry, offset, scale)
+        if not len(edges):
+            continue
+        premultiplied = [color[0] * color[3], color[1] * color[3], color[2] * color[3], color[3]]
+        for rows, columns, coverage in _coverage_blocks(edges, width, height, antialiasing):
+            if antialiasing == 1:
+                coverage = np.round(coverage)
+            # coverage of fully covered pixels may differ from 1 by rounding errors
+            full = coverage > 1 - 1e-6
+            partial = np.nonzero((coverage > 1e-6) & ~full)
+            partial_coverage = coverage[partial]
+            # premultiplied "over": dst = src * coverage + dst * (1 - alpha * coverage)
+            for plane, value in zip(canvas[:, rows, columns], premultiplied):
+                if color[3] == 1:
+                    np.copyto(plane, value, where=full)
+                else:
+                    plane[full] = value + plane[full] * (1 - color[3])
+                plane[partial] = value * partial_coverage + plane[partial] * (1 - color[3] * partial_coverage)
+
+    alpha = canvas[3]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rgb = np.where(alpha > 0, canvas[:3] / alpha, 0)
+    return np.round(np.concatenate([rgb, alpha[None]]).transpose(1, 2, 0) * 255).astype(np.uint8)
+
+
+def save_png(image: np.ndarray, file_name: str):
+    mpimg.imsave(file_name, image, format="png")
+
+
+def _edges_in_pixels(geometry, offset: np.ndarray, scale: np.ndarray) -> np.ndarray:
+    """
+    :return: array of (x0, y0, x1, y1) of edges of all rings of the (multi)polygon
+    """
+    rings = []
+    for polygon in getattr(geometry, "geoms", [geometry]):
+        if polygon.is_empty:
+            continue
+        rings.append(polygon.exterior)
+        rings.extend(polygon.interiors)
+    if not rings:
+        return np.empty((0, 4))
+    edges = []
+    for ring in rings:
+        coords = (np.asarray(ring.coords)[:, :2] - offset) * scale
+        edges.append(np.hstack([coords[:-1], coords[1:]]))
+    return np.concatenate(edges)
+
+
+def _coverage_blocks(edges: np.ndarray, width: int, height: int, samples: int):
+    """
+    Fraction of every pixel covered by the polygon (even-odd rule), computed for blocks of rows
+    within the bounding box of the polygon.
+    Crossings of edges with scanlines are paired into spans and every span adds its exact horizontal coverage
+    through a running sum: +(1 - f) and +f at the pixel where it starts, the same negated where it ends.
+    :return: generator of row slices, column slices and coverage arrays
+    """
+    x0, y0, x1, y1 = edges.T
+    row_min = max(0, int(np.floor(min(y0.min(), y1.min()))))
+    row_max = min(height, int(np.ceil(max(y0.max(), y1.max()))))
+    column_min = max(0, int(np.floor(min(x0.min(), x1.min()))))
+    column_max = min(width, int(np.ceil(max(x0.max(), x1.max()))))
+    if row_min >= row_max or column_min >= column_max:
+        return
+
+    # scanline j goes through y = row_min + (j + 0.5) / samples
+    lines_count = (row_max - row_min) * samples
+    not_horizontal = y0 != y1
+    x0, y0, x1, y1 = x0[not_horizontal], y0[not_horizontal], x1[not_horizontal], y1[not_horizontal]
+    low, high = np.minimum(y0, y1), np.maximum(y0, y1)
+    first_line = np.clip(np.ceil((low - row_min) * samples - 0.5), 0, lines_count).astype(np.int64)
+    end_line = np.clip(np.ceil((high - row_min) * samples - 0.5), 0, lines_count).astype(np.int64)
+    crossings_count = np.maximum(end_line - first_line, 0)
+    edge_of_crossing = np.repeat(np.arange(len(x0)), crossings_count)
+    line = np.repeat(first_line, crossings_count) + \
+        np.arange(crossings_count.sum()) - np.repeat(np.cumsum(crossings_count) - crossings_count, crossings_count)
+    y = row_min + (line + 0.5) / samples
+    x = x0[edge_of_crossing] + (y - y0[edge_of_crossing]) * \
+        (x1[edge_of_crossing] - x0[edge_of_crossing]) / (y1[edge_of_crossing] - y0[edge_of_crossing])
+
+    order = np.lexsort((x, line))
+    line, x = line[order], np.clip(x[order], column_min, column_max) - column_min
+    span_line, span_start, span_end = line[0::2], x[0::2], x[1::2]
+
+    columns_count = column_max - column_min
+    # two extra columns for spans ending at the right border
+    stride = columns_count + 2
+    lines_per_block = ROWS_PER_BLOCK * samples
+    for block_start in range(0, lines_count, lines_per_block):
+        block_end = min(lines_count, block_start + lines_per_block)
+        first, last = np.searchsorted(span_line, [block_start, block_end])
+        block_rows = (block_end - block_start) // samples
+        # scanlines of the same pixel row share the running sum, each with the weight 1 / samples
+        base = (span_line[first:last] - block_start) // samples * stride
+        positions, weights = [], []
+        for span_x, sign in ((span_start[first:last], 1 / samples), (span_end[first:last], -1 / samples)):
+            column = np.floor(span_x).astype(np.int64)
+            fraction = span_x - column
+            positions += [base + column, base + column + 1]
+            weights += [sign * (1 - fraction), sign * fraction]
+        accumulated = np.bincount(np.concatenate(positions), np.concatenate(weights), minlength=block_rows * stride)
+        coverage = np.cumsum(accumulated.reshape(block_rows, stride), axis=1)[:, :columns_count]
+        first_row = row_min + block_start // samples
+        yield (slice(first_row, first_row + block_rows), slice(column_min, column_max),
+               np.clip(coverage, 0, 1).astype(np.float32))
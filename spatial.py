@@ -0,0 +1,98 @@
+import warnings
+from collections.abc import Mapping
+from typing import Dict, Tuple, List, Hashable
+
+import numpy as np
+import scipy.spatial
+from shapely.errors import ShapelyDeprecationWarning
+from shapely.geometry.base import BaseGeometry
+from shapely.strtree import STRtree
+
+import profiling
+
+
+class PointIndex:
+    """
+    KD-tree over positions of vertices or region centers, answering batched nearest neighbour queries.
+    All queries take an array of shape (n, 2) or a single (x, y) pair and return ids of the points.
+    """
+
+    def __init__(self, ids: np.ndarray, positions: np.ndarray):
+        self.ids = ids
+        self.tree = scipy.spatial.cKDTree(positions)
+
+    @classmethod
+    def from_mapping(cls, pos_by_id: Dict[int, Tuple[float, float]]):
+        ids = np.fromiter(pos_by_id.keys(), dtype=np.int64, count=len(pos_by_id))
+        positions = np.array(list(pos_by_id.values()), dtype=float).reshape(-1, 2)
+        return cls(ids, positions)
+
+    def nearest(self, points) -> np.ndarray:
+        _, indices = self.tree.query(points)
+        return self.ids[indices]
+
+    def k_nearest(self, points, k: int) -> np.ndarray:
+        """
+        :return: ids of `k` nearest points, sorted by distance, with shape (n, k) for batched query
+        """
+        _, indices = self.tree.query(points, k=k)
+        return self.ids[indices]
+
+
+class GeometryIndex:
+    """
+    STRtree over geometries identified by ids, used to prefilter candidates by bounding boxes
+    before running exact shapely predicates.
+    """
+
+    def __init__(self, geometry_by_id: Dict[Hashable, BaseGeometry]):
+        # the mapping is read once, lazy mappings may build new geometry objects on every read
+        self.geometry_by_id = dict(geometry_by_id.items())
+        self._keys = list(self.geometry_by_id.keys())
+        with warnings.catch_warnings():
+            # shapely 1.8 warns about the API of shapely 2, querying positions of geometries works in both
+            warnings.simplefilter("ignore", ShapelyDeprecationWarning)
+            self.tree = STRtree(list(self.geometry_by_id.values()))
+
+    def candidates(self, geometry: BaseGeometry) -> List[Hashable]:
+        """
+        :return: ids of geometries whose bounding boxes intersect the bounding box of `geometry`
+        """
+        if hasattr(self.tree, "query_items"):
+            # shapely 1.8, `query` returns the geometries, `query_items` their positions
+            positions = self.tree.query_items(geometry)
+        else:
+            positions = self.tree.query(geometry)
+        return [self._keys[position] for position in positions]
+
+    def intersecting(self, geometry: BaseGeometry) -> List[Hashable]:
+        candidates = self.candidates(geometry)
+        profiling.count("shapely_intersections", len(candidates))
+        return [key for key in candidates if self.geometry_by_id[key].intersects(geometry)]
+
+
+class BoundsIndex:
+    """
+    Index of bounding boxes of geometries which doesn't keep the geometries, they're read from
+    `geometry_by_id` only for the exact predicates. Every query checks all boxes with numpy,
+    so it suits few queries over geometries which shouldn't stay in memory, e.g. a lazy `data.PolygonMapping`.
+    """
+
+    def __init__(self, geometry_by_id: Mapping, ids: np.ndarray, bounds: np.ndarray):
+        """
+        :param bounds: array of (min_x, min_y, max_x, max_y) of every id
+        """
+        self.geometry_by_id = geometry_by_id
+        self.ids = ids
+        self.bounds = bounds
+
+    def candidates(self, geometry: BaseGeometry) -> List[Hashable]:
+        min_x, min_y, max_x, max_y = geometry.bounds
+        overlapping = (self.bounds[:, 0] <= max_x) & (self.bounds[:, 2] >= min_x) & \
+                      (self.bounds[:, 1] <= max_y) & (self.bounds[:, 3] >= min_y)
+        return self.ids[overlapping].tolist()
+
+    def intersecting(self, geometry: BaseGeometry) -> List[Hashable]:
+        candidates = self.candidates(geometry)
+        profiling.count("shapely_intersections", len(candidates))
+        return [key for key in candidates if self.geometry_by_id[key].intersects(geometry)]
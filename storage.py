@@ -0,0 +1,180 @@
+import json
+from collections.abc import Mapping
+from os import path, makedirs
+from typing import List
+
+import numpy as np
+from shapely import wkb
+
+import data
+from graph import CsrAdjacency, Incidence
+
+FORMAT_VERSION = 1
+
+HEADER_FILE = "header.json"
+
+_GRAPHS = ["region_graph", "vertex_graph", "vertex_region_graph", "downslope_graph"]
+
+
+def save_world(world: data.World, directory: str):
+    """
+    Saves the world as a directory of .npy files (one per array) and a JSON header.
+    Geometries of mountain chains and clusters are stored as concatenated WKB blobs with offsets.
+    Noise fields and spatial indexes are not saved, they're rebuilt on demand.
+    """
+    makedirs(directory, exist_ok=True)
+    arrays = {
+        "vertex_positions": world.vertex_positions(),
+        "region_centers": np.array([world.center_by_region[region_id] for region_id in range(world.regions_count)],
+                                   dtype=float).reshape(-1, 2),
+        "region_vertices_indptr": world.incidence().indptr,
+        "region_vertices": world.incidence().vertices,
+    }
+    for name in _GRAPHS:
+        graph = getattr(world, name)
+        if graph is not None:
+            arrays[name + "_indptr"], arrays[name + "_indices"], arrays[name + "_nodes"] = \
+                graph.indptr, graph.indices, graph.nodes
+
+    if world.height_by_vertex is not None:
+        arrays["height_by_vertex"] = world.vertex_array(world.height_by_vertex)
+    if world.chain_by_vertex is not None:
+        arrays["chain_by_vertex"] = world.vertex_array(world.chain_by_vertex, fill=-1).astype(np.int64)
+    if world.height_by_region is not None:
+        arrays["height_by_region"] = world.region_array(world.height_by_region)
+    if world.moisture_by_vertex is not None:
+        arrays["moisture_by_vertex"] = world.vertex_array(world.moisture_by_vertex)
+    if world.terrain_codes is not None:
+        arrays["terrain_codes"] = world.terrain_codes
+    if world.steepest_downslope is not None:
+        arrays["steepest_downslope"] = world.steepest_downslope
+    arrays["rivers_indptr"], arrays["rivers"] = _ragged_arrays(world.rivers)
+    if world.mountain_chains is not None:
+        arrays["chain_lines_offsets"], arrays["chain_lines"] = \
+            _wkb_arrays([chain.line for chain in world.mountain_chains])
+        arrays["chain_heights"] = np.array([chain.height for chain in world.mountain_chains], dtype=float)
+    if world.clusters is not None:
+        arrays["cluster_polygons_offsets"], arrays["cluster_polygons"] = \
+            _wkb_arrays([cluster.polygon for cluster in world.clusters])
+        arrays["cluster_regions_indptr"], arrays["cluster_regions"] = \
+            _ragged_arrays([sorted(cluster.regions) for cluster in world.clusters])
+
+    header = {
+        "format_version": FORMAT_VERSION,
+        "regions_count": world.regions_count,
+        "vertices_size": world.vertex_graph.size,
+        "arrays": sorted(arrays.keys()),
+        "terrain_names": world.terrain_by_region.names if world.terrain_codes is not None else None,
+        "cluster_terrains": None if world.clusters is None else [cluster.terrain_type for cluster in world.clusters],
+    }
+    for name, array in arrays.items():
+        np.save(path.join(directory, name + ".npy"), np.ascontiguousarray(array))
+    with open(path.join(directory, HEADER_FILE), "w") as header_file:
+        json.dump(header, header_file, indent=2)
+
+
+def load_world(directory: str, mmap_mode="r", polygon_cache_size=None) -> data.World:
+    """
+    Loads the world saved by `save_world`. Arrays are memory-mapped, so only the parts which are used are read.
+    Topology is exposed as read-only views and per-element values as read-only dict-like views of the arrays,
+    so a loaded world is meant to be inspected and rendered, not to go through the generation again.
+    :param mmap_mode: passed to `np.load`, None reads all arrays into memory
+    :param polygon_cache_size: maximum number of region polygons kept in memory, see `data.PolygonMapping`
+    """
+    with open(path.join(directory, HEADER_FILE)) as header_file:
+        header = json.load(header_file)
+    if header["format_version"] != FORMAT_VERSION:
+        raise ValueError("unsupported world format version {}".format(header["format_version"]))
+    arrays = {name: np.load(path.join(directory, name + ".npy"), mmap_mode=mmap_mode) for name in header["arrays"]}
+
+    graphs = {name: CsrAdjacency(arrays[name + "_indptr"], arrays[name + "_indices"], arrays[name + "_nodes"])
+              for name in _GRAPHS if name + "_indptr" in arrays}
+    positions = arrays["vertex_positions"]
+    vertex_present = np.zeros(len(positions), dtype=bool)
+    vertex_present[graphs["vertex_graph"].nodes] = True
+    incidence = Incidence(arrays["region_vertices_indptr"], arrays["region_vertices"], len(positions))
+
+    world = data.World(
+        data.ArrayMapping(arrays["region_centers"]),
+        data.ArrayMapping(positions, vertex_present),
+        graphs["region_graph"],
+        _RingMapping(incidence),
+        graphs["vertex_graph"],
+        graphs["vertex_region_graph"],
+        data.PolygonMapping(positions, incidence.indptr, incidence.vertices, polygon_cache_size),
+        compact_topology=True,
+    )
+    world._incidence = incidence
+    world._vertex_positions = positions
+
+    if "height_by_vertex" in arrays:
+        world.height_by_vertex = data.ArrayMapping(arrays["height_by_vertex"], ~np.isnan(arrays["height_by_vertex"]))
+    if "chain_by_vertex" in arrays:
+        world.chain_by_vertex = data.ArrayMapping(arrays["chain_by_vertex"], arrays["chain_by_vertex"] >= 0)
+    if "height_by_region" in arrays:
+        world.height_by_region = data.ArrayMapping(arrays["height_by_region"])
+    if "moisture_by_vertex" in arrays:
+        world.moisture_by_vertex = data.ArrayMapping(arrays["moisture_by_vertex"],
+                                                     ~np.isnan(arrays["moisture_by_vertex"]))
+    if "terrain_codes" in arrays:
+        world.terrain_codes = arrays["terrain_codes"]
+        world.terrain_by_region = data.CodedMapping(world.terrain_codes, header["terrain_names"])
+    if "downslope_graph" in graphs:
+        world.downslope_graph = graphs["downslope_graph"]
+        world.downslopes = world.downslope_graph.view()
+    if "steepest_downslope" in arrays:
+        world.steepest_downslope = arrays["steepest_downslope"]
+    world.rivers = [river.tolist() for river in _split_ragged(arrays["rivers_indptr"], arrays["rivers"])]
+    if "chain_lines" in arrays:
+        world.mountain_chains = [data.ChainDescriptor(line, height) for line, height in
+                                 zip(_load_wkb(arrays["chain_lines_offsets"], arrays["chain_lines"]),
+                                     arrays["chain_heights"].tolist())]
+    if "cluster_polygons" in arrays:
+        polygons = _load_wkb(arrays["cluster_polygons_offsets"], arrays["cluster_polygons"])
+        regions = _split_ragged(arrays["cluster_regions_indptr"], arrays["cluster_regions"])
+        world.clusters = [data.Cluster(polygon, terrain_type, set(cluster_regions.tolist())) for
+                          polygon, terrain_type, cluster_regions in zip(polygons, header["cluster_terrains"], regions)]
+    return world
+
+
+class _RingMapping(Mapping):
+    """
+    Read-only view of vertex rings of regions stored in the incidence arrays
+    """
+
+    def __init__(self, incidence: Incidence):
+        self.incidence = incidence
+
+    def __getitem__(self, region_id):
+        if not 0 <= region_id < self.incidence.regions_count:
+            raise KeyError(region_id)
+        return self.incidence.vertices[self.incidence.indptr[region_id]:self.incidence.indptr[region_id + 1]].tolist()
+
+    def __iter__(self):
+        return iter(range(self.incidence.regions_count))
+
+    def __len__(self):
+        return self.incidence.regions_count
+
+
+def _ragged_arrays(lists: List[List[int]]):
+    indptr = np.zeros(len(lists) + 1, dtype=np.int64)
+    np.cumsum([len(values) for values in lists], out=indptr[1:])
+    values = np.fromiter((value for values in lists for value in values), dtype=np.int64, count=indptr[-1])
+    return indptr, values
+
+
+def _split_ragged(indptr: np.ndarray, values: np.ndarray) -> List[np.ndarray]:
+    return np.split(np.asarray(values), np.asarray(indptr)[1:-1]) if len(indptr) > 1 else []
+
+
+def _wkb_arrays(geometries):
+    blobs = [wkb.dumps(geometry) for geometry in geometries]
+    offsets = np.zeros(len(blobs) + 1, dtype=np.int64)
+    np.cumsum([len(blob) for blob in blobs], out=offsets[1:])
+    return offsets, np.frombuffer(b"".join(blobs), dtype=np.uint8)
+
+
+def _load_wkb(offsets: np.ndarray, blob: np.ndarray):
+    offsets = offsets.tolist()
+    return [wkb.loads(blob[start:end].tobytes()) for start, end in zip(offsets[:-1], offsets[1:])]
@@ -0,0 +1,33 @@
+import numpy as np
+from shapely.geometry import Polygon
+
+import boundaries
+import data
+import unittest
+
+
+class TestBoundaries(unittest.TestCase):
+    def setUp(self):
+        # 3x3 square regions of size 1, region 4 in the middle
+        vertices = np.array([[x, y] for y in range(4) for x in range(4)])
+        vertices_by_region = np.array([[y * 4 + x, y * 4 + x + 1, (y + 1) * 4 + x + 1, (y + 1) * 4 + x]
+                                       for y in range(3) for x in range(3)])
+        # clockwise rings are traced as well
+        vertices_by_region[0] = vertices_by_region[0][::-1]
+        centers = vertices_by_region.shape[0] * [[0, 0]]
+        self.world = data.convert_to_world(vertices_by_region, np.array(centers) + 0.5, vertices)
+
+    def test_ring_with_hole(self):
+        component_by_region = np.array([0, 0, 0, 0, 1, 0, 0, 0, 0])
+        ring, middle = boundaries.polygons_of_components(component_by_region, 2, self.world)
+
+        self.assertTrue(ring.equals(Polygon([(0, 0), (3, 0), (3, 3), (0, 3)], [[(1, 1), (2, 1), (2, 2), (1, 2)]])))
+        self.assertEqual(1, len(ring.interiors))
+        self.assertTrue(middle.equals(Polygon([(1, 1), (2, 1), (2, 2), (1, 2)])))
+
+    def test_excluded_regions_and_separate_parts(self):
+        component_by_region = np.array([0, -1, 0, -1, -1, -1, -1, -1, -1])
+        corners, = boundaries.polygons_of_components(component_by_region, 1, self.world)
+
+        self.assertEqual("MultiPolygon", corners.geom_type)
+        self.assertAlmostEqual(2.0, corners.area)
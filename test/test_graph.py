@@ -0,0 +1,46 @@
+import numpy as np
+
+import graph
+import unittest
+
+
+class TestGraph(unittest.TestCase):
+    def setUp(self):
+        # 0 - 1 - 2 - 3 - 4   5
+        self.path = graph.CsrAdjacency.from_mapping({0: {1}, 1: {0, 2}, 2: {1, 3}, 3: {2, 4}, 4: {3}, 5: set()})
+
+    def test_propagate_decay(self):
+        values = graph.propagate_decay(self.path, [0, 4], [1.0, 0.5], 0.5)
+        np.testing.assert_array_equal([1.0, 0.5, 0.25, 0.25, 0.5, -np.inf], values)
+
+    def test_propagate_decay_with_floor_and_cutoff(self):
+        np.testing.assert_array_equal([4.0, 2.0, 1.5, 1.5, 1.5, -np.inf],
+                                      graph.propagate_decay(self.path, [0], 4.0, 0.5, floor=1.5))
+        np.testing.assert_array_equal([4.0, 2.0, 1.0, -np.inf, -np.inf, -np.inf],
+                                      graph.propagate_decay(self.path, [0], 4.0, 0.5, cutoff=1.0))
+
+    def test_label_components(self):
+        labels = np.array([1, 1, 2, 1, 1, 1])
+        components, sizes = graph.label_components(self.path, labels)
+        self.assertEqual([0, 0, 1, 2, 2, 3], components.tolist())
+        self.assertEqual([2, 1, 2, 1], sizes.tolist())
+
+        components, sizes = graph.label_components(self.path, mask=np.array([True, True, False, True, True, True]))
+        self.assertEqual([[0, 1], [3, 4], [5]], [c.tolist() for c in graph.nodes_by_component(components, sizes)])
+        self.assertEqual(-1, components[2])
+
+    def test_incidence(self):
+        incidence = graph.Incidence.from_mapping({0: [0, 1, 2], 1: [2, 3], 2: [3, 4, 1]}, 6)
+        vertex_values = np.array([1.0, 2.0, 3.0, 4.0, 6.0, 100.0])
+
+        np.testing.assert_array_equal([2.0, 3.5, 4.0], incidence.mean(vertex_values))
+        np.testing.assert_array_equal([3.0, 4.0, 6.0], incidence.max(vertex_values))
+        np.testing.assert_array_equal([1, 0, 1], incidence.majority(np.array([1, 1, 0, 2, 1, 0]), 3))
+        np.testing.assert_array_equal([10, 30, 20, 30, 30, -1],
+                                      incidence.scatter(np.array([10, 20, 30]), reduce="max", fill=-1))
+        np.testing.assert_array_equal([10, 20, 15, 25, 30],
+                                      incidence.scatter(np.array([10, 20, 30]), reduce="mean")[:5])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+from unittest.mock import patch
+
+import numpy as np
+from shapely.geometry import LineString
+
+import data
+import unittest
+
+from world_generation import heightmap, voronoi
+
+
+class TestHeightmap(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(0)
+        self.world = data.convert_voronoi_to_world(voronoi.relaxed_voronoi(300, [(0, 1), (0, 1)], 1))
+        # without noise every step from a vertex decreases the height by 0.02
+        patcher = patch("world_generation.heightmap._noise_by_vertex",
+                        return_value=np.zeros(self.world.vertex_graph.size))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _expected_heights(self, sources):
+        """
+        Fixed point of height(v) = max(source height of v, max of height(n) - 0.02 of all neighbours n)
+        """
+        height_by_vertex = {vertex_id: (height, chain_id) for vertex_id, (height, chain_id) in sources.items()}
+        changed = True
+        while changed:
+            changed = False
+            for vertex_id, (height, chain_id) in list(height_by_vertex.items()):
+                neighbour_height = max(heightmap.MIN_HEIGHT, height - 0.02)
+                for neighbour in self.world.vertices_touching_vertex[vertex_id]:
+                    if neighbour_height > height_by_vertex.get(neighbour, (heightmap.MIN_HEIGHT - 1, None))[0]:
+                        height_by_vertex[neighbour] = (neighbour_height, chain_id)
+                        changed = True
+        return height_by_vertex
+
+    def test_propagate_heights_of_many_sources(self):
+        vertex_ids = list(self.world.pos_by_vertex)
+        first, next_to_first = vertex_ids[0], next(iter(self.world.vertices_touching_vertex[vertex_ids[0]]))
+        sources = {first: (0.9, 0), next_to_first: (0.5, 1), vertex_ids[100]: (0.751, 2), vertex_ids[200]: (0.333, 3)}
+
+        height_by_vertex, chain_by_vertex = heightmap._propagate_heights(sources, self.world)
+
+        expected = self._expected_heights(sources)
+        self.assertEqual(set(self.world.pos_by_vertex), set(height_by_vertex))
+        for vertex_id, (height, chain_id) in expected.items():
+            self.assertAlmostEqual(height, height_by_vertex[vertex_id])
+            self.assertEqual(chain_id, chain_by_vertex[vertex_id])
+        # the lower source next to a higher one gets the height spread by the higher one
+        self.assertAlmostEqual(0.88, height_by_vertex[next_to_first])
+        self.assertEqual(0, chain_by_vertex[next_to_first])
+
+    def test_heights_are_not_lower_than_min_height(self):
+        vertex_id = next(iter(self.world.pos_by_vertex))
+        height_by_vertex, _ = heightmap._propagate_heights({vertex_id: (-0.99, 0)}, self.world)
+
+        self.assertEqual(-0.99, height_by_vertex.pop(vertex_id))
+        self.assertEqual({heightmap.MIN_HEIGHT}, set(height_by_vertex.values()))
+
+    def test_chain_height_contribution(self):
+        self.world.mountain_chains = [data.ChainDescriptor(LineString([(0.2, 0.2), (0.5, 0.6)]), 0.8)]
+        with patch("world_generation.heightmap._decrease_height_close_to_border"):
+            heightmap.create_heightmap(self.world)
+
+        self.assertEqual(self.world.height_by_vertex, heightmap.chain_height_contribution(0, self.world))
+        self.assertEqual({0}, set(self.world.chain_by_vertex.values()))
+
+    def test_downslopes(self):
+        heights = np.random.RandomState(1).uniform(-0.3, 1, self.world.vertex_graph.size)
+        self.world.height_by_vertex = {vertex_id: heights[vertex_id] for vertex_id in self.world.pos_by_vertex}
+        self.world.height_by_region = {region_id: np.mean([heights[vertex_id] for vertex_id in vertices])
+                                       for region_id, vertices in self.world.vertices_by_region.items()}
+
+        downslopes = heightmap._calc_downslopes_and_water_borders(self.world)
+
+        touching_water_count = 0
+        for vertex_id, regions in self.world.regions_touching_vertex.items():
+            lower = {neighbour for neighbour in self.world.vertices_touching_vertex[vertex_id]
+                     if heights[neighbour] < heights[vertex_id]}
+            if any(self.world.height_by_region[region_id] < 0 for region_id in regions):
+                touching_water_count += 1
+                lower = set()
+            self.assertEqual(lower, set(downslopes[vertex_id]))
+            lowest = min(lower, key=lambda neighbour: heights[neighbour]) if lower else -1
+            self.assertEqual(lowest, self.world.steepest_downslope[vertex_id])
+        self.assertGreater(touching_water_count, 0)
@@ -0,0 +1,20 @@
+import noise
+import numpy as np
+
+from world_generation import noise_field
+import unittest
+
+
+class TestNoiseField(unittest.TestCase):
+    def test_same_values_as_noise_package(self):
+        np.random.seed(0)
+        points = (np.random.rand(500, 2) - 0.3) * 30
+        for parameters in [{}, {"octaves": 6}, {"octaves": 3, "persistence": 0.4, "lacunarity": 2.3,
+                                                "repeatx": 16, "repeaty": 8}]:
+            expected = [noise.pnoise2(x, y, **parameters) for x, y in points.tolist()]
+            np.testing.assert_array_equal(np.array(expected, dtype=np.float32),
+                                          noise_field.pnoise2(points[:, 0], points[:, 1], **parameters))
+
+
+if __name__ == "__main__":
+    unittest.main()
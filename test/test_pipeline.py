@@ -0,0 +1,104 @@
+import os
+import tempfile
+from unittest.mock import patch
+
+import numpy as np
+
+import graph
+import pipeline
+from pipeline import Pipeline, Stage
+import unittest
+
+from world_generation import heightmap
+
+
+class TestPipeline(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.calls = []
+
+    def tearDown(self):
+        self.cache_dir.cleanup()
+
+    def _stages(self, scale):
+        def random_values(count):
+            self.calls.append("values")
+            return np.random.rand(count)
+
+        def scaled(values, scale):
+            self.calls.append("scaled")
+            return values * scale
+
+        return [Stage("values", random_values, params={"count": 3}),
+                Stage("scaled", scaled, inputs={"values": "values"}, params={"scale": scale})]
+
+    def test_resume_from_cached_stages(self):
+        first = Pipeline(self._stages(2), 7, self.cache_dir.name).run()
+        np.testing.assert_array_equal(first, Pipeline(self._stages(2), 7, self.cache_dir.name).run())
+        self.assertEqual(["values", "scaled"], self.calls)
+
+        pipeline = Pipeline(self._stages(4), 7, self.cache_dir.name)
+        np.testing.assert_array_equal(first * 2, pipeline.run())
+        self.assertEqual(["values", "scaled", "scaled"], self.calls)
+        self.assertEqual(["values"], pipeline.cached_stages)
+
+    def test_stages_are_reseeded(self):
+        values = Pipeline(self._stages(1), 7, self.cache_dir.name).run(until="values")
+        np.random.seed(123)
+        np.testing.assert_array_equal(values, Pipeline(self._stages(1), 7, self.cache_dir.name).run(force=True))
+        self.assertFalse(np.array_equal(values, Pipeline(self._stages(1), 8, self.cache_dir.name).run()))
+
+    def test_unseeded_stages_are_shared_between_seeds(self):
+        def random_values(count, rng):
+            self.calls.append("values")
+            return rng.random(count)
+
+        stages = [Stage("values", random_values, params={"count": 3}, rng="numpy", seeded=False)]
+        first = Pipeline(stages, 1, self.cache_dir.name).run()
+        np.testing.assert_array_equal(first, Pipeline(stages, 2, self.cache_dir.name).run())
+        self.assertEqual(["values"], self.calls)
+
+    def test_changed_code_invalidates_cache(self):
+        stages = self._stages(2)
+        pipeline = Pipeline(stages, 7, self.cache_dir.name)
+        with patch("pipeline._code_fingerprint", return_value="edited"):
+            edited_pipeline = Pipeline(stages, 7, self.cache_dir.name)
+        self.assertNotEqual(pipeline.hash_by_stage, edited_pipeline.hash_by_stage)
+        stages[1].version = 1
+        self.assertNotEqual(pipeline.hash_by_stage["scaled"],
+                            Pipeline(stages, 7, self.cache_dir.name).hash_by_stage["scaled"])
+
+    def test_edited_dependency_changes_fingerprint(self):
+        fingerprint = pipeline._code_fingerprint(heightmap.create_heightmap)
+        source_hash = pipeline._source_hash
+
+        def edited_graph_source(file_name):
+            return b"edited" if file_name == graph.__file__ else source_hash(file_name)
+
+        with patch("pipeline._source_hash", side_effect=edited_graph_source):
+            self.assertNotEqual(fingerprint, pipeline._code_fingerprint(heightmap.create_heightmap))
+        self.assertEqual(fingerprint, pipeline._code_fingerprint(heightmap.create_heightmap))
+
+    def test_cache_files_follow_umask(self):
+        umask = os.umask(0o022)
+        try:
+            Pipeline(self._stages(2), 7, self.cache_dir.name).run(until="values")
+        finally:
+            os.umask(umask)
+        cache_file, = os.listdir(self.cache_dir.name)
+        self.assertEqual(0o644, os.stat(os.path.join(self.cache_dir.name, cache_file)).st_mode & 0o777)
+
+    def test_interrupted_write_leaves_no_cache(self):
+        pipeline = Pipeline(self._stages(2), 7, self.cache_dir.name)
+        with patch("pickle.dump", side_effect=KeyboardInterrupt):
+            with self.assertRaises(KeyboardInterrupt):
+                pipeline.run(until="values")
+        self.assertEqual([], os.listdir(self.cache_dir.name))
+
+    def test_uncached_stages(self):
+        stages = self._stages(2)
+        stages[1].cache = False
+        first = Pipeline(stages, 7, self.cache_dir.name).run()
+        np.testing.assert_array_equal(first, Pipeline(stages, 7, self.cache_dir.name).run())
+        self.assertEqual(["values", "scaled", "scaled"], self.calls)
+        self.assertEqual(1, len(os.listdir(self.cache_dir.name)))
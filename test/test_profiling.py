@@ -0,0 +1,55 @@
+import json
+import tempfile
+import tracemalloc
+from unittest.mock import patch
+
+import graph
+import profiling
+import unittest
+
+
+class TestProfiling(unittest.TestCase):
+    def test_stage_profiles(self):
+        path = graph.CsrAdjacency.from_mapping({0: {1}, 1: {0, 2}, 2: {1}})
+        profiler = profiling.Profiler()
+        with profiler.stage("decay"):
+            graph.propagate_decay(path, [0], 1.0, 0.5)
+            profiling.count("custom", 2)
+            data = [0] * 100000
+        graph.propagate_decay(path, [0], 1.0, 0.5)
+
+        profile, = profiler.stages
+        self.assertEqual({"graph_nodes_visited": 3, "custom": 2}, profile.counters)
+        self.assertGreater(profile.wall_seconds, 0)
+        self.assertGreaterEqual(profile.peak_memory_bytes, len(data) * 8)
+
+        with tempfile.NamedTemporaryFile(suffix=".json") as file:
+            profiler.save(file.name)
+            self.assertEqual("decay", json.load(open(file.name))["stages"][0]["name"])
+
+    def test_nested_stages(self):
+        profiler = profiling.Profiler()
+        with profiler.stage("outer"):
+            data = [0] * 100000
+            del data
+            with profiler.stage("inner"):
+                inner_data = [0] * 1000
+
+        inner, outer = profiler.stages
+        self.assertGreaterEqual(outer.peak_memory_bytes, 100000 * 8)
+        self.assertGreaterEqual(inner.peak_memory_bytes, len(inner_data) * 8)
+        self.assertLess(inner.peak_memory_bytes, 100000 * 8)
+        self.assertFalse(tracemalloc.is_tracing())
+
+    def test_peak_memory_without_reset_peak(self):
+        profiler = profiling.Profiler()
+        with patch.object(tracemalloc, "reset_peak"):
+            del tracemalloc.reset_peak
+            with profiler.stage("outer"):
+                with profiler.stage("inner"):
+                    data = [0] * 100000
+
+        inner, outer = profiler.stages
+        self.assertIsNone(inner.peak_memory_bytes)
+        self.assertGreaterEqual(outer.peak_memory_bytes, len(data) * 8)
+        self.assertFalse(tracemalloc.is_tracing())
@@ -0,0 +1,32 @@
+import numpy as np
+from shapely.geometry import box, Point
+
+import raster
+import unittest
+
+
+class TestRaster(unittest.TestCase):
+    def test_coverage_of_pixels(self):
+        image = raster.render_shapes([(box(0.15, 0.1, 0.9, 0.62), (1, 0, 0, 1))], 10, 10, ((0, 1), (0, 1)))
+
+        np.testing.assert_array_equal([0, 128, 255, 255, 255, 255, 255, 255, 255, 0], image[5, :, 3])
+        np.testing.assert_array_equal([0, 0, 0, 64, 255, 255, 255, 255, 255, 0], image[:, 5, 3])
+        np.testing.assert_array_equal([255, 0, 0], image[5, 5, :3])
+
+    def test_holes_and_drawing_order(self):
+        ring = Point(0.5, 0.5).buffer(0.4).difference(Point(0.5, 0.5).buffer(0.2))
+        image = raster.render_shapes([(box(0, 0, 1, 1), (0, 0, 1, 1)), (ring, (1, 0, 0, 1))],
+                                     200, 200, ((0, 1), (0, 1)))
+
+        np.testing.assert_array_equal([0, 0, 255, 255], image[100, 100])
+        np.testing.assert_array_equal([255, 0, 0, 255], image[100, 30])
+        red_area = (image[:, :, 0] / 255).sum() / 200 ** 2
+        self.assertAlmostEqual(np.pi * (0.4 ** 2 - 0.2 ** 2), red_area, places=2)
+
+    def test_translucent_shapes(self):
+        image = raster.render_shapes([(box(0, 0, 1, 1), (0, 0, 1, 1)), (box(0, 0, 0.55, 1), (1, 0, 0, 0.5))],
+                                     10, 10, ((0, 1), (0, 1)))
+
+        np.testing.assert_allclose([128, 0, 128, 255], image[5, 2], atol=1)
+        np.testing.assert_allclose([64, 0, 191, 255], image[5, 5], atol=1)
+        np.testing.assert_array_equal([0, 0, 255, 255], image[5, 8])
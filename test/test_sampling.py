@@ -0,0 +1,21 @@
+import numpy as np
+import scipy.spatial
+
+from world_generation import sampling
+import unittest
+
+
+class TestSampling(unittest.TestCase):
+    def test_poisson_disk_points_are_spaced(self):
+        np.random.seed(0)
+        points = sampling.poisson_disk_points(2000, [(0, 2), (1, 2)])
+        self.assertEqual(2000, len(points))
+        self.assertTrue(np.all((points >= [0, 1]) & (points <= [2, 2])))
+
+        radius = (sampling.POISSON_DISK_DENSITY * 2 / 2000) ** 0.5
+        distances, _ = scipy.spatial.cKDTree(points).query(points, k=2)
+        self.assertGreaterEqual(distances[:, 1].min(), radius)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+import random
+import tempfile
+
+import numpy as np
+
+import data
+import storage
+import unittest
+
+from world_generation import voronoi, mountain_chains, heightmap, rivers, terrains, clustering
+
+
+class TestStorage(unittest.TestCase):
+    def test_save_and_load(self):
+        np.random.seed(0)
+        world = data.convert_voronoi_to_world(voronoi.relaxed_voronoi(2000, [(0, 1), (0, 1)], 1))
+        mountain_chains.create_mountain_chains(5, world, random.Random(0))
+        heightmap.create_heightmap(world)
+        rivers.generate_rivers(3, world, random.Random(0))
+        terrains.generate_terrains(world)
+        clustering.cluster_terrains(world)
+
+        with tempfile.TemporaryDirectory() as directory:
+            storage.save_world(world, directory)
+            loaded = storage.load_world(directory)
+
+            self.assertIsInstance(loaded.terrain_codes, np.memmap)
+            self.assertEqual(world.regions_count, loaded.regions_count)
+            self.assertEqual(dict(world.pos_by_vertex), dict(loaded.pos_by_vertex))
+            self.assertEqual(dict(world.vertices_by_region), dict(loaded.vertices_by_region))
+            self.assertEqual(dict(world.regions_touching_region), dict(loaded.regions_touching_region))
+            self.assertEqual(dict(world.height_by_vertex), dict(loaded.height_by_vertex))
+            self.assertEqual(dict(world.terrain_by_region), dict(loaded.terrain_by_region))
+            self.assertEqual(dict(world.downslopes), dict(loaded.downslopes))
+            self.assertEqual(world.rivers, loaded.rivers)
+            self.assertEqual([chain.line for chain in world.mountain_chains],
+                             [chain.line for chain in loaded.mountain_chains])
+            self.assertEqual([(cluster.terrain_type, cluster.regions) for cluster in world.clusters],
+                             [(cluster.terrain_type, cluster.regions) for cluster in loaded.clusters])
+            self.assertTrue(world.clusters[0].polygon.equals(loaded.clusters[0].polygon))
+            self.assertTrue(world.polygon_by_region[7].equals(loaded.polygon_by_region[7]))
@@ -0,0 +1,54 @@
+import itertools
+from types import SimpleNamespace
+
+import numpy as np
+
+import unittest
+
+from world_generation import terrains
+from world_generation.terrains import TerrainTypes
+
+
+def terrain_by_height_and_moisture(height, moisture):
+    """
+    Rules applied to every vertex before terrains were classified with numpy
+    """
+    if height < -0.2:
+        return TerrainTypes.DEEP_WATER
+    if height < 0:
+        return TerrainTypes.SHALLOW_WATER
+    if height > 0.6:
+        return TerrainTypes.MOUNTAIN
+    if height > 0.45 and moisture > 0.7:
+        return TerrainTypes.CONIFEROUS_FOREST
+    if height > 0.1 and moisture > 0.7:
+        return TerrainTypes.DECIDUOUS_FOREST
+    if moisture > 0.5:
+        return TerrainTypes.GRASSLAND
+    return TerrainTypes.PLAINS
+
+
+class TestTerrains(unittest.TestCase):
+    def test_classification_matches_per_vertex_rules(self):
+        # thresholds themselves and values right next to them
+        thresholds = [-0.2, 0, 0.1, 0.45, 0.5, 0.6, 0.7]
+        values = sorted({value + offset for value in thresholds for offset in (-1e-9, 0, 1e-9)} | {-1.0, 0.3, 1.0})
+        height, moisture = np.array(list(itertools.product(values, values))).T
+
+        codes = terrains._terrain_codes_by_height_and_moisture(height, moisture)
+
+        self.assertEqual(np.uint8, codes.dtype)
+        self.assertEqual([terrain_by_height_and_moisture(h, m) for h, m in zip(height, moisture)],
+                         [terrains.TERRAIN_NAME_BY_CODE[code] for code in codes])
+
+    def test_coded_mapping_reads_and_writes_codes(self):
+        world = SimpleNamespace()
+        terrains.set_terrain_codes(np.array([terrains.TerrainCodes.LAKE, terrains.TerrainCodes.PLAINS]), world)
+
+        self.assertEqual({0: TerrainTypes.LAKE, 1: TerrainTypes.PLAINS}, dict(world.terrain_by_region))
+        world.terrain_by_region[1] = TerrainTypes.MOUNTAIN
+        self.assertEqual(terrains.TerrainCodes.MOUNTAIN, world.terrain_codes[1])
+        world.terrain_codes[0] = terrains.TerrainCodes.DEEP_WATER
+        self.assertEqual(TerrainTypes.DEEP_WATER, world.terrain_by_region[0])
+        with self.assertRaises(KeyError):
+            world.terrain_by_region[2]
@@ -0,0 +1,32 @@
+import tempfile
+from os import path
+from types import SimpleNamespace
+
+import matplotlib.image as mpimg
+from shapely.geometry import box
+
+import data
+import tiles
+import unittest
+
+from world_generation.terrains import TerrainTypes
+
+
+class TestTiles(unittest.TestCase):
+    def test_tile_bounds(self):
+        self.assertEqual(((0, 1), (0, 1)), tiles.tile_bounds(0, 0, 0))
+        self.assertEqual(((0.25, 0.5), (0.5, 0.75)), tiles.tile_bounds(2, 1, 1))
+
+    def test_unchanged_tiles_are_skipped(self):
+        lake = data.Cluster(box(0.1, 0.1, 0.4, 0.4), TerrainTypes.LAKE, {0})
+        world = SimpleNamespace(clusters=[lake], mountain_chains=[], rivers=[], pos_by_vertex={})
+
+        with tempfile.TemporaryDirectory() as directory:
+            self.assertEqual({"rendered": 5, "skipped": 0}, tiles.render_tiles(world, directory, 1, workers=1))
+            self.assertEqual({"rendered": 0, "skipped": 5}, tiles.render_tiles(world, directory, 1, workers=1))
+            # only the lower left tile of zoom 1 contains the lake
+            self.assertEqual(0, mpimg.imread(path.join(directory, "1", "1", "0.png"))[:, :, 3].max())
+            self.assertEqual(1, mpimg.imread(path.join(directory, "1", "0", "1.png"))[200, 100, 3])
+
+            world.clusters.append(data.Cluster(box(0.6, 0.6, 0.7, 0.7), TerrainTypes.LAKE, {1}))
+            self.assertEqual({"rendered": 2, "skipped": 3}, tiles.render_tiles(world, directory, 1, workers=1))
@@ -14,6 +14,37 @@ class TestVoronoi(unittest.TestCase):
         self.assertEqual(1, len(vor.filtered_regions))
         self.assertEqual({0, 1, 2, 3}, set(vor.filtered_regions[0]))
 
+    def test_batched_centroids(self):
+        np.random.seed(0)
+        bounding_box = np.array([(0, 1), (0, 1)]).ravel()
+        vor = voronoi._voronoi(np.random.rand(200, 2), bounding_box)
+        expected = [voronoi._centroid_region(vor.vertices[region + [region[0]], :])[0]
+                    for region in vor.filtered_regions]
+        centroids = voronoi._centroids_of_regions(vor.vertices, vor.filtered_regions)
+        np.testing.assert_allclose(expected, centroids)
+
+    def test_margin_limited_mirroring_gives_the_same_regions(self):
+        np.random.seed(0)
+        bounding_box = np.array([(0, 1), (0, 1)]).ravel()
+        points = voronoi.relaxed_voronoi(500, [(0, 1), (0, 1)], 2).filtered_points
+        margin = voronoi.default_mirror_margin(500, [(0, 1), (0, 1)])
+
+        vor = voronoi._voronoi(points, bounding_box)
+        margin_vor = voronoi._voronoi(points, bounding_box, margin)
+        self.assertLess(len(margin_vor.points), len(vor.points) / 2)
+        self.assertEqual(self._region_polygons(vor), self._region_polygons(margin_vor))
+
+    def test_relaxation_stops_when_converged(self):
+        np.random.seed(0)
+        vor = voronoi.relaxed_voronoi(300, [(0, 1), (0, 1)], 50, tolerance=0.002)
+        displacements = [step.mean_displacement for step in vor.relaxation_history]
+        self.assertLess(len(displacements), 50)
+        self.assertLess(displacements[-1], 0.002)
+        self.assertTrue(all(d >= 0.002 for d in displacements[:-1]))
+
+    def _region_polygons(self, vor):
+        return {frozenset(map(tuple, np.round(vor.vertices[region], 9).tolist())) for region in vor.filtered_regions}
+
     def _to_set_of_tuples(self, np_array):
         return set(map(tuple, np_array.tolist()))
 
@@ -1,8 +1,13 @@
+import random
+
 import numpy as np
+from shapely.geometry import Point
 
 import data
 import unittest
 
+from world_generation import voronoi, mountain_chains, heightmap
+
 
 class TestVoronoi(unittest.TestCase):
     def test_four_square_regions(self):
@@ -30,6 +35,97 @@ class TestVoronoi(unittest.TestCase):
                           4: {3, 5}, 5: {2, 4, 6}, 6: {5, 7}, 7: {2, 6, 8}, 8: {1, 7}},
                          world.vertices_touching_vertex)
 
+    def test_compact_topology_views(self):
+        vertices_by_region = np.array([[0, 1, 2, 3], [1, 2, 7, 8], [2, 5, 6, 7], [2, 3, 4, 5]])
+        centers_by_region = np.array([[1, 1], [3, 1], [3, 3], [1, 3]])
+        vertices = np.array([[0, 0], [2, 0], [2, 2], [0, 2], [0, 4], [2, 4], [4, 4], [4, 2], [4, 0]])
+        world = data.convert_to_world(vertices_by_region, centers_by_region, vertices, compact_topology=False)
+        compact_world = data.convert_to_world(vertices_by_region, centers_by_region, vertices)
+
+        self.assertEqual(world.regions_touching_region, compact_world.regions_touching_region)
+        self.assertEqual(world.vertices_touching_vertex, compact_world.vertices_touching_vertex)
+        self.assertEqual(world.regions_touching_vertex, compact_world.regions_touching_vertex)
+        self.assertEqual([1, 3, 5, 7], compact_world.vertex_graph.neighbours(2).tolist())
+        for adjacency in (world.regions_touching_region, compact_world.regions_touching_region):
+            with self.assertRaises(TypeError):
+                adjacency[0] = {1}
+            with self.assertRaises(AttributeError):
+                adjacency[0].add(3)
+
+    def test_vectorized_conversion_is_equivalent(self):
+        vertices_by_region = np.array([[0, 1, 2, 3], [1, 2, 7, 8], [2, 5, 6, 7], [2, 3, 4, 5]])
+        centers_by_region = np.array([[1, 1], [3, 1], [3, 3], [1, 3]])
+        vertices = np.array([[0, 0], [2, 0], [2, 2], [0, 2], [0, 4], [2, 4], [4, 4], [4, 2], [4, 0]])
+        self._assert_equivalent_conversion(vertices_by_region, centers_by_region, vertices)
+
+        np.random.seed(0)
+        vor = voronoi.relaxed_voronoi(300, [(0, 1), (0, 1)], 1)
+        self._assert_equivalent_conversion(vor.filtered_regions, vor.filtered_points, vor.vertices)
+
+    def _assert_equivalent_conversion(self, vertices_by_region, centers_by_region, vertices):
+        expected = data.convert_to_world(vertices_by_region, centers_by_region, vertices, vectorized=False)
+        world = data.convert_to_world(vertices_by_region, centers_by_region, vertices)
+
+        self.assertEqual(expected.regions_touching_region, world.regions_touching_region)
+        self.assertEqual(expected.vertices_touching_vertex, world.vertices_touching_vertex)
+        self.assertEqual(expected.regions_touching_vertex, world.regions_touching_vertex)
+        self.assertEqual(expected.pos_by_vertex, world.pos_by_vertex)
+        self.assertEqual((expected.regions_count, expected.vertices_count), (world.regions_count, world.vertices_count))
+
+    def test_conversion_from_ridges(self):
+        np.random.seed(0)
+        vor = voronoi.relaxed_voronoi(300, [(0, 1), (0, 1)], 1)
+        expected = data.convert_to_world(vor.filtered_regions, vor.filtered_points, vor.vertices)
+        world = data.convert_voronoi_to_world(vor)
+
+        self.assertEqual(expected.regions_touching_region, world.regions_touching_region)
+        self.assertEqual(expected.vertices_touching_vertex, world.vertices_touching_vertex)
+        self.assertEqual(expected.regions_touching_vertex, world.regions_touching_vertex)
+        self.assertEqual(expected.pos_by_vertex, world.pos_by_vertex)
+        for region_id, center in world.center_by_region.items():
+            self.assertTrue(world.polygon_by_region[region_id].contains(Point(center)))
+
+    def test_conversion_from_ridges_without_corner_neighbours(self):
+        points = np.array([[0.25, 0.25], [0.75, 0.25], [0.75, 0.75], [0.25, 0.75]])
+        vor = voronoi._voronoi(points, np.array([(0, 1), (0, 1)]).ravel())
+        world = data.convert_voronoi_to_world(vor)
+        edge_world = data.convert_voronoi_to_world(vor, edge_neighbours_only=True)
+
+        self.assertEqual({r: set(range(4)) - {r} for r in range(4)}, world.regions_touching_region)
+        for region_id, neighbours in edge_world.regions_touching_region.items():
+            self.assertEqual(2, len(neighbours))
+            self.assertNotIn(region_id, neighbours)
+
+    def test_point_location(self):
+        np.random.seed(0)
+        world = data.convert_voronoi_to_world(voronoi.relaxed_voronoi(300, [(0, 1), (0, 1)], 1))
+        queries = np.random.rand(50, 2)
+
+        nearest_vertices = world.nearest_vertex(queries)
+        for (x, y), vertex_id in zip(queries, nearest_vertices):
+            self.assertEqual(min(world.pos_by_vertex, key=lambda v: np.hypot(world.pos_by_vertex[v][0] - x,
+                                                                              world.pos_by_vertex[v][1] - y)),
+                             vertex_id)
+        for query, region_id in zip(queries, world.nearest_region(queries)):
+            self.assertTrue(world.polygon_by_region[region_id].contains(Point(query)))
+        self.assertEqual(nearest_vertices.tolist(), world.k_nearest_vertices(queries, 3)[:, 0].tolist())
+
     def test_calculate_neighbouring_vertices(self):
         vertices_touching_vertex = data._calculate_neighbouring_vertices([[0, 1, 3], [2, 3, 1]])
         self.assertEqual({0: {1, 3}, 1: {0, 2, 3}, 2: {1, 3}, 3: {0, 1, 2}}, vertices_touching_vertex)
+
+    def test_bounded_polygon_cache(self):
+        np.random.seed(0)
+        vor = voronoi.relaxed_voronoi(2000, [(0, 1), (0, 1)], 1)
+        world = data.convert_voronoi_to_world(vor, polygon_cache_size=100)
+        unbounded_world = data.convert_voronoi_to_world(vor)
+        mountain_chains.create_mountain_chains(5, world, random.Random(0))
+        unbounded_world.mountain_chains = world.mountain_chains
+
+        for chain in world.mountain_chains:
+            self.assertEqual(sorted(unbounded_world.region_polygon_index().intersecting(chain.line)),
+                             sorted(world.region_polygon_index().intersecting(chain.line)))
+        heightmap.create_heightmap(world)
+        groups = data.merge_heights_into_blobs(world)
+        self.assertGreater(len(groups), 1)
+        self.assertLessEqual(len(world.polygon_by_region._cache), 100)
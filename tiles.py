@@ -0,0 +1,91 @@
+import hashlib
+import json
+from concurrent.futures import ProcessPoolExecutor
+from os import path, makedirs
+from typing import List
+
+from shapely import wkb
+from shapely.geometry import box
+
+import data
+import raster
+from spatial import GeometryIndex
+
+TILE_SIZE = 256
+MANIFEST_FILE = "tiles.json"
+# change when the rendering changes, so all tiles are rendered again
+RENDERER_VERSION = 1
+
+# shapes of the map in the worker process, set by `_init_worker`
+_worker_shapes: List[raster.Shape] = None
+
+
+def tile_bounds(z: int, x: int, y: int) -> raster.Bounds:
+    """
+    Area of the map covered by the tile, the map spans (0, 1) in both dimensions. Tile y grows downwards.
+    """
+    tiles_count = 2 ** z
+    return (x / tiles_count, (x + 1) / tiles_count), (1 - (y + 1) / tiles_count, 1 - y / tiles_count)
+
+
+def render_tiles(world: data.World, output_dir: str, max_zoom: int, workers: int = None, antialiasing: int = 4):
+    """
+    Renders the map as a pyramid of tiles <output_dir>/z/x/y.png from zoom 0 (the whole map) to `max_zoom`.
+    Every tile draws only shapes intersecting its bounds. A hash of the shapes of every tile is kept
+    in the manifest, so tiles whose shapes didn't change since the previous rendering are skipped.
+    :param workers: number of processes rendering tiles, all CPUs by default
+    :return: number of rendered and skipped tiles
+    """
+    shapes = raster.map_shapes(world)
+    shape_index = GeometryIndex({shape_id: geometry for shape_id, (geometry, _) in enumerate(shapes)})
+    shape_digests = [hashlib.sha256(wkb.dumps(geometry) + repr(color).encode()).digest() for geometry, color in shapes]
+
+    manifest_path = path.join(output_dir, MANIFEST_FILE)
+    previous_hashes = {}
+    if path.exists(manifest_path):
+        with open(manifest_path) as manifest_file:
+            previous_hashes = json.load(manifest_file)
+
+    hashes = {}
+    to_render = []
+    for z in range(max_zoom + 1):
+        for x in range(2 ** z):
+            for y in range(2 ** z):
+                (min_x, max_x), (min_y, max_y) = tile_bounds(z, x, y)
+                shape_ids = sorted(shape_index.intersecting(box(min_x, min_y, max_x, max_y)))
+                tile_hash = hashlib.sha256(json.dumps([RENDERER_VERSION, TILE_SIZE, antialiasing, z, x, y]).encode())
+                for shape_id in shape_ids:
+                    tile_hash.update(shape_digests[shape_id])
+                tile_name = "{}/{}/{}".format(z, x, y)
+                hashes[tile_name] = tile_hash.hexdigest()
+                tile_path = path.join(output_dir, tile_name + ".png")
+                if previous_hashes.get(tile_name) != hashes[tile_name] or not path.exists(tile_path):
+                    to_render.append(((z, x, y), shape_ids, tile_path))
+
+    if to_render:
+        for _, _, tile_path in to_render:
+            makedirs(path.dirname(tile_path), exist_ok=True)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(shapes,)) as executor:
+            list(executor.map(_render_tile, to_render, [antialiasing] * len(to_render), chunksize=16))
+
+    with open(manifest_path, "w") as manifest_file:
+        json.dump(hashes, manifest_file, indent=0)
+    return {"rendered": len(to_render), "skipped": len(hashes) - len(to_render)}
+
+
+def _init_worker(shapes: List[raster.Shape]):
+    global _worker_shapes
+    _worker_shapes = shapes
+
+
+def _render_tile(tile, antialiasing):
+    (z, x, y), shape_ids, tile_path = tile
+    bounds = (min_x, max_x), (min_y, max_y) = tile_bounds(z, x, y)
+    # shapes are clipped to the tile (with a margin of a pixel), so edges of large clusters
+    # outside of it aren't rasterized for every tile
+    margin = (max_x - min_x) / TILE_SIZE
+    tile_box = box(min_x - margin, min_y - margin, max_x + margin, max_y + margin)
+    shapes = [(_worker_shapes[shape_id][0].intersection(tile_box), _worker_shapes[shape_id][1])
+              for shape_id in shape_ids]
+    image = raster.render_shapes(shapes, TILE_SIZE, TILE_SIZE, bounds, antialiasing)
+    raster.save_png(image, tile_path)
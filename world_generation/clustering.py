@@ -1,18 +1,17 @@
 import data
-from shapely.ops import cascaded_union
+import graph
+from boundaries import polygons_of_components
+
+from world_generation.terrains import TERRAIN_NAME_BY_CODE
 
 
 def cluster_terrains(world: data.World):
-    all_regions = set(world.regions_touching_region.keys())
     clusters = []
-    while all_regions:
-        current_region = all_regions.pop()
-        current_terrain = world.terrain_by_region[current_region]
-        cluster = data.walk_over_regions([current_region],
-                                         lambda x: world.terrain_by_region[x] == current_terrain,
-                                         world)
-        all_regions.difference_update(cluster)
-        cluster_polygon = cascaded_union([world.polygon_by_region[r] for r in cluster])
+    component_by_region, sizes = graph.label_components(world.region_graph, world.terrain_codes)
+    polygon_by_component = polygons_of_components(component_by_region, len(sizes), world)
+    for cluster, cluster_polygon in zip(graph.nodes_by_component(component_by_region, sizes), polygon_by_component):
+        current_terrain = TERRAIN_NAME_BY_CODE[world.terrain_codes[cluster[0]]]
+        cluster = set(cluster.tolist())
 
         clusters += [data.Cluster(cluster_polygon, current_terrain, cluster)]
 
@@ -1,12 +1,14 @@
-import itertools
+from collections import Counter
 
+import numpy as np
 from shapely.geometry import LineString, Point
 
 import data
-from collections import Counter
+import graph
+import profiling
+from world_generation.terrains import TerrainTypes, TerrainCodes
 
-from world_generation import terrains
-from world_generation.terrains import TerrainTypes
+FORESTS = [TerrainCodes.CONIFEROUS_FOREST, TerrainCodes.DECIDUOUS_FOREST]
 
 
 def _most_frequent(list_of_values):
@@ -33,70 +35,52 @@ def remove_small_isolated_terrain_areas(world: data.World):
     removed_blobs = 0
     for blob in blobs:
         # removing lake would make river go nowhere
-        if len(blob) <= 3 and world.terrain_by_region[list(blob)[0]] != terrains.TerrainTypes.LAKE:
+        if len(blob) <= 3 and world.terrain_codes[blob[0]] != TerrainCodes.LAKE:
+            blob_regions = set(blob.tolist())
             neighbours = set()
-            for region_id in blob:
-                new_neighbours = [neighbour for neighbour in world.regions_touching_region[region_id]
-                                  if neighbour not in blob]
+            for region_id in blob_regions:
+                new_neighbours = [neighbour for neighbour in world.region_graph.neighbours(region_id).tolist()
+                                  if neighbour not in blob_regions]
 
                 neighbours.update(new_neighbours)
-            most_frequent_neighbour = _most_frequent([world.terrain_by_region[neighbour] for neighbour in neighbours])
+            most_frequent_neighbour = _most_frequent(world.terrain_codes[list(neighbours)].tolist())
 
-            for region_id in blob:
-                world.terrain_by_region[region_id] = most_frequent_neighbour
+            world.terrain_codes[blob] = most_frequent_neighbour
             removed_blobs += 1
     print("removed", removed_blobs, "artifacts")
 
 
 def shallowize_lakes_touching_sea(world):
-    shallow_waters = [region_id for region_id, terrain in world.terrain_by_region.items() if
-                      terrain == TerrainTypes.SHALLOW_WATER]
-    lakes_to_turn_into_shallow_water = data.walk_over_regions(shallow_waters,
-                                                              lambda r: world.terrain_by_region[r] == TerrainTypes.LAKE,
-                                                              world)
-    for region_id in lakes_to_turn_into_shallow_water:
-        world.terrain_by_region[region_id] = TerrainTypes.SHALLOW_WATER
+    shallow_waters = np.flatnonzero(world.terrain_codes == TerrainCodes.SHALLOW_WATER)
+    lakes_to_turn_into_shallow_water = graph.reachable(world.region_graph, shallow_waters,
+                                                       world.terrain_codes == TerrainCodes.LAKE)
+    world.terrain_codes[lakes_to_turn_into_shallow_water] = TerrainCodes.SHALLOW_WATER
 
 
 def _get_terrain_blobs(world):
-    regions_to_visit = set(world.regions_touching_region.keys())
-    blobs = []
-    while regions_to_visit:
-        region_id = regions_to_visit.pop()
-        terrain_type = world.terrain_by_region[region_id]
-
-        current_blob = {region_id}
-        regions_of_current_blob_to_visit = {region_id}
-        while regions_of_current_blob_to_visit:
-            region_of_same_terrain = regions_of_current_blob_to_visit.pop()
-            new_neighbours = [neighbour for neighbour in world.regions_touching_region[region_of_same_terrain]
-                              if world.terrain_by_region[neighbour] == terrain_type
-                              and neighbour not in current_blob]
-            current_blob.update(new_neighbours)
-            regions_of_current_blob_to_visit.update(new_neighbours)
-        blobs.append(current_blob)
-        regions_to_visit.difference_update(current_blob)
-    return blobs
+    """
+    :return: list of arrays of regions of every connected area of the same terrain
+    """
+    return graph.nodes_by_component(*graph.label_components(world.region_graph, world.terrain_codes))
 
 
 def remove_river_segments_in_lakes(world: data.World):
+    touching_lake = _vertices_touching_lake(world)
     resultant_rivers = []
     for river in world.rivers:
         river_so_far = []
         for current_vertex in river:
             river_so_far += [current_vertex]
-            if _any_region_touching_vertex_is_lake(current_vertex, world):
+            if touching_lake[current_vertex]:
                 break
         if len(river_so_far) > 1:
             resultant_rivers += [river_so_far]
     world.rivers = resultant_rivers
 
 
-def _any_region_touching_vertex_is_lake(vertex: data.VertexId, world: data.World):
-    for region_id in world.regions_touching_vertex[vertex]:
-        if world.terrain_by_region[region_id] in (TerrainTypes.LAKE, TerrainTypes.SHALLOW_WATER):
-            return True
-    return False
+def _vertices_touching_lake(world: data.World) -> np.ndarray:
+    lakes = np.isin(world.terrain_codes, [TerrainCodes.LAKE, TerrainCodes.SHALLOW_WATER])
+    return world.incidence().scatter(lakes, reduce="max", fill=0) > 0
 
 
 def remove_mountain_chains_which_are_too_low(world: data.World):
@@ -105,53 +89,43 @@ def remove_mountain_chains_which_are_too_low(world: data.World):
 
 
 def add_shallow_water_near_coast(world):
-    shallowize_neighbours = []
-    for region_id, terrain in world.terrain_by_region.items():
-        if terrain == TerrainTypes.DEEP_WATER:
-            for neighbour in world.regions_touching_region[region_id]:
-                if world.terrain_by_region[neighbour] not in (TerrainTypes.DEEP_WATER, TerrainTypes.SHALLOW_WATER):
-                    shallowize_neighbours += [neighbour]
-                    _turn_into_shallow_water(neighbour, world)
-    for region_id in shallowize_neighbours:
-        _turn_into_shallow_water(region_id, world)
-    shallowize_neighbours = list(itertools.chain(*[world.regions_touching_region[r] for r in shallowize_neighbours]))
-    for region_id in shallowize_neighbours:  # second line of shallow water
-        if world.terrain_by_region[region_id] == TerrainTypes.DEEP_WATER:
-            _turn_into_shallow_water(region_id, world)
+    sources, targets = world.region_graph.edges()
+    deep_water = world.terrain_codes == TerrainCodes.DEEP_WATER
+    water = deep_water | (world.terrain_codes == TerrainCodes.SHALLOW_WATER)
+    shallowize_neighbours = np.unique(targets[deep_water[sources] & ~water[targets]])
+    _turn_into_shallow_water(shallowize_neighbours, world)
+
+    next_to_shallowized = np.zeros(world.regions_count, dtype=bool)
+    next_to_shallowized[shallowize_neighbours] = True
+    # second line of shallow water
+    _turn_into_shallow_water(np.unique(targets[next_to_shallowized[sources] & deep_water[targets]]), world)
 
 
 def shallowize_isolated_deep_water(world: data.World):
     border_vertices = data.vertices_touching_border(world)
-    border_regions = set()
-    for v in border_vertices:
-        border_regions.update(world.regions_touching_vertex[v])
+    border_regions = np.unique(world.vertex_region_graph.edges_from(np.array(border_vertices, dtype=np.int64))[1])
 
-    deep_water_touching_border = data.walk_over_regions(border_regions,
-                                                        lambda r: world.terrain_by_region[r] == TerrainTypes.DEEP_WATER,
-                                                        world)
-    for region_id, terrain in world.terrain_by_region.items():
-        if region_id not in deep_water_touching_border and terrain == TerrainTypes.DEEP_WATER:
-            _turn_into_shallow_water(region_id, world)
+    deep_water = world.terrain_codes == TerrainCodes.DEEP_WATER
+    deep_water_touching_border = graph.reachable(world.region_graph, border_regions, deep_water)
+    _turn_into_shallow_water(np.flatnonzero(deep_water & ~deep_water_touching_border), world)
 
 
-def _turn_into_shallow_water(region_id: data.RegionId, world: data.World):
-    world.height_by_region[region_id] = -0.1
-    world.terrain_by_region[region_id] = TerrainTypes.SHALLOW_WATER
+def _turn_into_shallow_water(region_ids: np.ndarray, world: data.World):
+    for region_id in region_ids.tolist():
+        world.height_by_region[region_id] = -0.1
+    world.terrain_codes[region_ids] = TerrainCodes.SHALLOW_WATER
 
 
 def deforest_near_coast(world: data.World):
-    neighbours_to_deforest = []
-    for region_id, terrain in world.terrain_by_region.items():
-        neighbouring_terrains = [world.terrain_by_region[n] for n in world.regions_touching_region[region_id]]
-        if terrain in (TerrainTypes.CONIFEROUS_FOREST,
-                       TerrainTypes.DECIDUOUS_FOREST,
-                       TerrainTypes.GRASSLAND) and TerrainTypes.SHALLOW_WATER in neighbouring_terrains:
-            world.terrain_by_region[region_id] = TerrainTypes.GRASSLAND
-            neighbours_to_deforest += world.regions_touching_region[region_id]
+    sources, targets = world.region_graph.edges()
+    near_shallow_water = np.zeros(world.regions_count, dtype=bool)
+    near_shallow_water[sources[world.terrain_codes[targets] == TerrainCodes.SHALLOW_WATER]] = True
+    to_deforest = np.isin(world.terrain_codes, FORESTS + [TerrainCodes.GRASSLAND]) & near_shallow_water
+    world.terrain_codes[to_deforest] = TerrainCodes.GRASSLAND
 
-    for region_id in neighbours_to_deforest:
-        if world.terrain_by_region[region_id] in (TerrainTypes.CONIFEROUS_FOREST, TerrainTypes.DECIDUOUS_FOREST):
-            world.terrain_by_region[region_id] = TerrainTypes.GRASSLAND
+    neighbours_to_deforest = np.unique(targets[to_deforest[sources]])
+    neighbours_to_deforest = neighbours_to_deforest[np.isin(world.terrain_codes[neighbours_to_deforest], FORESTS)]
+    world.terrain_codes[neighbours_to_deforest] = TerrainCodes.GRASSLAND
 
 
 def fix_mountain_center_line_to_fully_cover_mountain_polygon(world: data.World):
@@ -161,9 +135,11 @@ def fix_mountain_center_line_to_fully_cover_mountain_polygon(world: data.World):
     :param world:
     :return:
     """
-    mountains = [cluster for cluster in world.clusters if cluster.terrain_type == TerrainTypes.MOUNTAIN]
+    cluster_index = world.cluster_index()
     for mountain_chain in world.mountain_chains:
-        intersecting_mountains = [mountain for mountain in mountains if mountain.polygon.intersects(mountain_chain.line)]
+        intersecting_mountains = [world.clusters[cluster_id]
+                                  for cluster_id in sorted(cluster_index.intersecting(mountain_chain.line))
+                                  if world.clusters[cluster_id].terrain_type == TerrainTypes.MOUNTAIN]
         if not intersecting_mountains:
             continue
         if len(intersecting_mountains) > 1:
@@ -186,6 +162,7 @@ def _move_point_farther_away(border_point, second_point, poly):
     new_point = Point(second_point[0] + (border_point[0] - second_point[0]) * 100,
                       second_point[1] + (border_point[1] - second_point[1]) * 100)
 
+    profiling.count("shapely_intersections")
     intersection = poly.exterior.intersection(LineString([new_point, second_point]))
     if not isinstance(intersection, Point):
         raise ValueError("the mountain chain cannot reach the border")
@@ -1,98 +1,129 @@
-import collections
-import statistics
+import heapq
+from typing import Dict, Tuple
 
-import noise
+import numpy as np
 
 import data
+import graph
+import profiling
+from world_generation import noise_field
+
+# height of vertices far away from all mountain chains
+MIN_HEIGHT = -1
 
 
 def create_heightmap(world: data.World):
     world.height_by_vertex = {}
     world.height_by_region = {}
 
-    for chain in world.mountain_chains:
-        vertices = set_heights_of_mountain_chain(chain, world)
-
-        visited_vertices = set()
-        to_process = collections.deque(vertices)
-
-        while to_process:
-            vertex_id = to_process.popleft()
-            if vertex_id in visited_vertices:
-                continue
-            neighbours = [n for n in world.vertices_touching_vertex[vertex_id] if n not in visited_vertices]
-            to_process.extend(neighbours)
-
-            visited_vertices.add(vertex_id)
-            for neighbour in neighbours:
-                world.height_by_vertex[neighbour] = get_height(neighbour, vertex_id, world)
+    sources = {}
+    for chain_id, chain in enumerate(world.mountain_chains):
+        for vertex_id in set_heights_of_mountain_chain(chain, world):
+            if vertex_id not in sources or sources[vertex_id][0] < chain.height:
+                sources[vertex_id] = (chain.height, chain_id)
+    world.height_by_vertex, world.chain_by_vertex = _propagate_heights(sources, world)
 
     _decrease_height_close_to_border(world)
 
-    for region_id, vertices in world.vertices_by_region.items():
-        average_height = statistics.mean([world.height_by_vertex[vertex] for vertex in vertices])
-        world.height_by_region[region_id] = average_height
+    height_by_region = world.incidence().mean(world.vertex_array(world.height_by_vertex))
+    world.height_by_region = dict(enumerate(height_by_region.tolist()))
     world.downslopes = _calc_downslopes_and_water_borders(world)
 
 
-def get_height(this_vertex: data.VertexId, neighbour: data.VertexId, world: data.World):
-    neighbour_height = world.height_by_vertex[neighbour]
-    current_height_coeff = (1 if neighbour_height > data.MIN_MOUNTAIN_HEIGHT else 0.15)
-    applied_noise = 0.02 + min(0.2, abs(_noise(*world.pos_by_vertex[neighbour]))) * current_height_coeff
-    return max(world.height_by_vertex.get(this_vertex, -1),
-               neighbour_height - applied_noise)
+def chain_height_contribution(chain_id: int, world: data.World) -> Dict[data.VertexId, float]:
+    """
+    Heights which would be produced by a single mountain chain, useful for debugging
+    """
+    chain = world.mountain_chains[chain_id]
+    sources = {vertex_id: (chain.height, chain_id) for vertex_id in _vertices_of_mountain_chain(chain, world)}
+    height_by_vertex, _ = _propagate_heights(sources, world)
+    return height_by_vertex
+
+
+def _propagate_heights(sources: Dict[data.VertexId, Tuple[float, int]], world: data.World):
+    """
+    Spreads heights of all mountain chains at once. Every vertex gets the max of heights of its neighbours
+    decreased by `_height_decrease` (but not lower than MIN_HEIGHT), so the vertex with the highest known height is always final
+    and can be settled using a priority queue, like in Dijkstra's algorithm.
+    :return: height of every vertex and id of the mountain chain which determined it
+    """
+    indptr = world.vertex_graph.indptr.tolist()
+    indices = world.vertex_graph.indices.tolist()
+    noise_by_vertex = _noise_by_vertex(world).tolist()
+    height_by_vertex = {}
+    chain_by_vertex = {}
+    best_heights = {vertex_id: height for vertex_id, (height, _) in sources.items()}
+    to_process = [(-height, vertex_id, chain_id) for vertex_id, (height, chain_id) in sources.items()]
+    heapq.heapify(to_process)
+    while to_process:
+        negative_height, vertex_id, chain_id = heapq.heappop(to_process)
+        if vertex_id in height_by_vertex:
+            continue
+        height = -negative_height
+        height_by_vertex[vertex_id] = height
+        chain_by_vertex[vertex_id] = chain_id
+
+        neighbour_height = max(MIN_HEIGHT, height - _height_decrease(height, noise_by_vertex[vertex_id]))
+        for neighbour in indices[indptr[vertex_id]:indptr[vertex_id + 1]]:
+            if neighbour not in height_by_vertex and neighbour_height > best_heights.get(neighbour, MIN_HEIGHT - 1):
+                best_heights[neighbour] = neighbour_height
+                heapq.heappush(to_process, (-neighbour_height, neighbour, chain_id))
+    profiling.count("graph_nodes_visited", len(height_by_vertex))
+    return height_by_vertex, chain_by_vertex
+
+
+def _height_decrease(height: float, noise: float):
+    current_height_coeff = (1 if height > data.MIN_MOUNTAIN_HEIGHT else 0.15)
+    return 0.02 + min(0.2, abs(noise)) * current_height_coeff
 
 
 def set_heights_of_mountain_chain(chain: data.ChainDescriptor, world: data.World):
+    vertices = _vertices_of_mountain_chain(chain, world)
+    for vertex_id in vertices:
+        world.height_by_vertex[vertex_id] = chain.height
+    return vertices
+
+
+def _vertices_of_mountain_chain(chain: data.ChainDescriptor, world: data.World):
     vertices = set()
-    for region_id, polygon in world.polygon_by_region.items():
-        if polygon.intersects(chain.line):
-            for vertex_id in world.vertices_by_region[region_id]:
-                world.height_by_vertex[vertex_id] = chain.height
-                vertices.add(vertex_id)
+    for region_id in world.region_polygon_index().intersecting(chain.line):
+        vertices.update(world.vertices_by_region[region_id])
     return vertices
 
 
 def _decrease_height_close_to_border(world: data.World):
     vertices_touching_border = data.vertices_touching_border(world)
-    height_decreases = {vertex_id: 4.0 for vertex_id in vertices_touching_border}
-    to_visit = vertices_touching_border
-    while to_visit:
-        vertex_id = to_visit.pop()
-        curr_vertex_height_decrease = height_decreases[vertex_id]
-        for neighbour in world.vertices_touching_vertex[vertex_id]:
-            if neighbour not in height_decreases or max(0.01, curr_vertex_height_decrease * 0.75) > height_decreases[neighbour]:
-                height_decreases[neighbour] = max(0.01, curr_vertex_height_decrease * 0.75)
-                to_visit.append(neighbour)
-    for vertex_id, decrease in height_decreases.items():
+    height_decreases = graph.propagate_decay(world.vertex_graph, vertices_touching_border, 4.0, 0.75, floor=0.01)
+    reached = world.vertex_graph.nodes[np.isfinite(height_decreases[world.vertex_graph.nodes])]
+    for vertex_id, decrease in zip(reached.tolist(), height_decreases[reached].tolist()):
         world.height_by_vertex[vertex_id] -= decrease
 
 
 def _calc_downslopes_and_water_borders(world: data.World):
-    downslopes = {}
-    for vertex, neighbouring_vertices in world.vertices_touching_vertex.items():
-        any_touching_region_is_water = any(
-            [world.height_by_region[region_id] < 0 for region_id in world.regions_touching_vertex[vertex]])
-        if any_touching_region_is_water:
-            downslopes[vertex] = set()
-        else:
-            current_height = world.height_by_vertex[vertex]
-            downslopes[vertex] = set([n for n in neighbouring_vertices if world.height_by_vertex[n] < current_height])
-    return downslopes
-
-
-def _noise(x, y):
-    scale = 10.0
-    octaves = 6
-    persistence = 0.5
-    lacunarity = 2.0
-
-    r = noise.pnoise2(x * scale,
-                      y * scale,
-                      octaves=octaves,
-                      persistence=persistence,
-                      lacunarity=lacunarity,
-                      repeatx=1024,
-                      repeaty=1024,
-                      base=0)
-    return r
+    """
+    Lower neighbours of every vertex which doesn't touch water, computed for all edges at once.
+    Sets `world.downslope_graph` and `world.steepest_downslope` (the lowest neighbour or -1 if there is none)
+    :return: read-only dict-like view of downslopes of every vertex
+    """
+    height_by_vertex = world.vertex_array(world.height_by_vertex)
+    height_by_region = world.region_array(world.height_by_region)
+
+    touches_water = world.incidence().scatter(height_by_region, reduce="min", fill=0) < 0
+
+    sources, targets = world.vertex_graph.edges()
+    downhill = (height_by_vertex[targets] < height_by_vertex[sources]) & ~touches_water[sources]
+    sources, targets = sources[downhill], targets[downhill]
+    world.downslope_graph = graph.CsrAdjacency.from_edges(sources, targets, world.vertex_graph.size,
+                                                          world.vertex_graph.nodes)
+
+    by_source_and_height = np.lexsort((height_by_vertex[targets], sources))
+    first_of_source = np.ones(len(sources), dtype=bool)
+    first_of_source[1:] = sources[by_source_and_height][1:] != sources[by_source_and_height][:-1]
+    world.steepest_downslope = np.full(world.vertex_graph.size, -1, dtype=np.int64)
+    world.steepest_downslope[sources[by_source_and_height][first_of_source]] = \
+        targets[by_source_and_height][first_of_source]
+    return world.downslope_graph.view()
+
+
+def _noise_by_vertex(world: data.World):
+    return noise_field.noise_by_vertex(world, scale=10.0, octaves=6, persistence=0.5, lacunarity=2.0, base=0)
@@ -0,0 +1,118 @@
+"""
+Numpy implementation of Perlin noise from the `noise` package (`noise.pnoise2`) evaluating whole arrays of points
+at once. Computations are done in float32 like in the C extension, so the values are the same.
+The only difference is for `base` > 0, when the C extension reads past its permutation table for some cells,
+while here the indices wrap around.
+"""
+from typing import Dict, Tuple
+
+import numpy as np
+
+import data
+import profiling
+
+_PERMUTATION = np.array([
+    151, 160, 137, 91, 90, 15, 131, 13, 201, 95, 96, 53, 194, 233, 7, 225, 140, 36, 103, 30, 69, 142, 8, 99, 37, 240,
+    21, 10, 23, 190, 6, 148, 247, 120, 234, 75, 0, 26, 197, 62, 94, 252, 219, 203, 117, 35, 11, 32, 57, 177, 33, 88,
+    237, 149, 56, 87, 174, 20, 125, 136, 171, 168, 68, 175, 74, 165, 71, 134, 139, 48, 27, 166, 77, 146, 158, 231, 83,
+    111, 229, 122, 60, 211, 133, 230, 220, 105, 92, 41, 55, 46, 245, 40, 244, 102, 143, 54, 65, 25, 63, 161, 1, 216,
+    80, 73, 209, 76, 132, 187, 208, 89, 18, 169, 200, 196, 135, 130, 116, 188, 159, 86, 164, 100, 109, 198, 173, 186,
+    3, 64, 52, 217, 226, 250, 124, 123, 5, 202, 38, 147, 118, 126, 255, 82, 85, 212, 207, 206, 59, 227, 47, 16, 58,
+    17, 182, 189, 28, 42, 223, 183, 170, 213, 119, 248, 152, 2, 44, 154, 163, 70, 221, 153, 101, 155, 167, 43, 172, 9,
+    129, 22, 39, 253, 19, 98, 108, 110, 79, 113, 224, 232, 178, 185, 112, 104, 218, 246, 97, 228, 251, 34, 242, 193,
+    238, 210, 144, 12, 191, 179, 162, 241, 81, 51, 145, 235, 249, 14, 239, 107, 49, 192, 214, 31, 181, 199, 106, 157,
+    184, 84, 204, 176, 115, 121, 50, 45, 127, 4, 150, 254, 138, 236, 205, 93, 222, 114, 67, 29, 24, 72, 243, 141, 128,
+    195, 78, 66, 215, 61, 156, 180,
+] * 2, dtype=np.int64)
+
+# x and y components of gradients indexed by the lowest 4 bits of the hash
+_GRADIENT_X = np.array([1, -1, 1, -1, 1, -1, 1, -1, 0, 0, 0, 0, 1, -1, 0, 0], dtype=np.float32)
+_GRADIENT_Y = np.array([1, 1, -1, -1, 0, 0, 0, 0, 1, -1, 1, -1, 0, 0, -1, 1], dtype=np.float32)
+
+BATCH_SIZE = 65536
+
+
+def pnoise2(x, y, octaves=1, persistence=0.5, lacunarity=2.0, repeatx=1024, repeaty=1024, base=0) -> np.ndarray:
+    x = np.asarray(x, dtype=np.float32)
+    y = np.asarray(y, dtype=np.float32)
+    if octaves < 1:
+        raise ValueError("Expected octaves value > 0")
+    if octaves == 1:
+        return _noise2(x, y, np.float32(repeatx), np.float32(repeaty), base)
+
+    frequency = np.float32(1.0)
+    amplitude = np.float32(1.0)
+    max_amplitude = np.float32(0.0)
+    total = np.zeros(x.shape, dtype=np.float32)
+    for _ in range(octaves):
+        total += _noise2(x * frequency, y * frequency,
+                         np.float32(repeatx) * frequency, np.float32(repeaty) * frequency, base) * amplitude
+        max_amplitude += amplitude
+        frequency *= np.float32(lacunarity)
+        amplitude *= np.float32(persistence)
+    return total / max_amplitude
+
+
+def _noise2(x, y, repeatx, repeaty, base):
+    i = np.floor(np.fmod(x, repeatx)).astype(np.int64)
+    j = np.floor(np.fmod(y, repeaty)).astype(np.int64)
+    ii = np.fmod((i + 1).astype(np.float32), repeatx).astype(np.int64)
+    jj = np.fmod((j + 1).astype(np.float32), repeaty).astype(np.int64)
+    i = (i & 255) + base
+    j = (j & 255) + base
+    ii = (ii & 255) + base
+    jj = (jj & 255) + base
+
+    x = x - np.floor(x)
+    y = y - np.floor(y)
+    fx = x * x * x * (x * (x * np.float32(6) - np.float32(15)) + np.float32(10))
+    fy = y * y * y * (y * (y * np.float32(6) - np.float32(15)) + np.float32(10))
+
+    a = _perm(i)
+    aa = _perm(a + j)
+    ab = _perm(a + jj)
+    b = _perm(ii)
+    ba = _perm(b + j)
+    bb = _perm(b + jj)
+
+    one = np.float32(1)
+    return _lerp(fy, _lerp(fx, _gradient(_perm(aa), x, y), _gradient(_perm(ba), x - one, y)),
+                 _lerp(fx, _gradient(_perm(ab), x, y - one), _gradient(_perm(bb), x - one, y - one)))
+
+
+def _perm(index):
+    return np.take(_PERMUTATION, index, mode="wrap")
+
+
+def _gradient(hash_value, x, y):
+    h = hash_value & 15
+    return x * _GRADIENT_X[h] + y * _GRADIENT_Y[h]
+
+
+def _lerp(t, a, b):
+    return a + t * (b - a)
+
+
+NoiseParameters = Tuple[float, int, float, float, int]
+
+
+def noise_by_vertex(world: data.World, scale: float, octaves: int, persistence: float, lacunarity: float,
+                    base: int = 0) -> np.ndarray:
+    """
+    Noise at positions of all vertices scaled by `scale`, as an array indexed by vertex id.
+    It's evaluated in batches and cached on the world, keyed by the seed (`base`) and noise parameters.
+    """
+    key: NoiseParameters = (scale, octaves, persistence, lacunarity, base)
+    noise_fields: Dict[NoiseParameters, np.ndarray] = world.noise_fields
+    if key not in noise_fields:
+        vertex_ids = world.vertex_graph.nodes
+        positions = np.array([world.pos_by_vertex[vertex_id] for vertex_id in vertex_ids.tolist()]).reshape(-1, 2)
+        field = np.full(world.vertex_graph.size, np.nan)
+        profiling.count("noise_evaluations", len(vertex_ids))
+        for start in range(0, len(vertex_ids), BATCH_SIZE):
+            batch = slice(start, start + BATCH_SIZE)
+            field[vertex_ids[batch]] = pnoise2(positions[batch, 0] * scale, positions[batch, 1] * scale,
+                                               octaves=octaves, persistence=persistence, lacunarity=lacunarity,
+                                               base=base)
+        noise_fields[key] = field
+    return noise_fields[key]
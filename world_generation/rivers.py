@@ -9,21 +9,26 @@ import data
 MIN_RIVER_LENGTH = 5
 
 
-def generate_rivers(rivers: int, world: data.World):
+def generate_rivers(rivers: int, world: data.World, rng: random.Random = None):
+    """
+    :param rng: random generator to use instead of the global state of the `random` module
+    """
+    rng = rng or random
     mountain_vertices = [vertex for vertex, height in world.height_by_vertex.items() if
                          height >= data.MIN_MOUNTAIN_HEIGHT]
     created_rivers = []
     vertices_having_river = set()
     attempts = 0
+    downslope_counts = world.downslope_graph.degrees()
     while len(created_rivers) < rivers and attempts < 1000:
         attempts += 1
-        spring_id = random.choice(mountain_vertices)
+        spring_id = rng.choice(mountain_vertices)
 
         river = [spring_id]
         failed_attempts = 0
         while True:
             last_river_segment = river[-1]
-            if len(world.downslopes[last_river_segment]) == 0:  # no downslopes
+            if downslope_counts[last_river_segment] == 0:  # no downslopes
                 if world.height_by_vertex[last_river_segment] < 0:  # river reaches existing sea/lake
                     break
 
@@ -38,13 +43,13 @@ def generate_rivers(rivers: int, world: data.World):
                 else:
                     break
             else:
-                downslope_having_river = _downslope_having_river(world.downslopes[last_river_segment],
-                                                                 vertices_having_river)
+                downslopes = world.downslope_graph.neighbours(last_river_segment).tolist()
+                downslope_having_river = _downslope_having_river(downslopes, vertices_having_river)
                 if downslope_having_river:
                     river.append(downslope_having_river)
                     break
 
-                next_river_vertex = random.choice(tuple(world.downslopes[last_river_segment]))
+                next_river_vertex = rng.choice(downslopes)
                 river.append(next_river_vertex)
 
         if len(river) > MIN_RIVER_LENGTH:
@@ -84,17 +89,7 @@ def _create_lake_around_center(center: data.VertexId, world: data.World):
 
 
 def _closest_vertex(x, y, world: data.World) -> data.VertexId:
-    closest_vertex = 0
-    min_distance = 9999
-    for vertex_id, pos in world.pos_by_vertex.items():
-        if distance(x, y, pos[0], pos[1]) < min_distance:
-            closest_vertex = vertex_id
-            min_distance = distance(x, y, pos[0], pos[1])
-    return closest_vertex
-
-
-def distance(a_x, a_y, b_x, b_y):
-    return ((b_x - a_x) ** 2 + (b_y - a_y) ** 2) ** 0.5
+    return int(world.nearest_vertex((x, y)))
 
 
 def _downslope_having_river(downslopes, vertices_having_river):
@@ -0,0 +1,75 @@
+import numpy as np
+
+# number of points of a (nearly) maximal Poisson-disk sample of radius r is about DENSITY * area / r^2
+POISSON_DISK_DENSITY = 0.6
+
+# offsets of grid cells which can contain a point closer than the radius
+_NEIGHBOURING_CELLS = np.array([(i, j) for i in range(-2, 3) for j in range(-2, 3) if (abs(i), abs(j)) != (2, 2)])
+
+
+def uniform_points(number_of_points, bounding_box_2d, rng: np.random.Generator = None):
+    """
+    :param rng: random generator to use instead of the global state of `np.random`
+    """
+    rng = np.random if rng is None else rng
+    (min_x, max_x), (min_y, max_y) = bounding_box_2d
+    return rng.random((number_of_points, 2)) * [max_x - min_x, max_y - min_y] + [min_x, min_y]
+
+
+def poisson_disk_points(number_of_points, bounding_box_2d, rounds=10, rng: np.random.Generator = None):
+    """
+    Blue noise sample of about `number_of_points` points, no two of them closer than a radius derived from
+    the number of points, so that the Voronoi cells are regular even without Lloyd relaxation.
+
+    The plane is divided into a grid of cells of size radius/sqrt(2), so each cell contains at most one point
+    and a candidate needs to be compared only with points in the neighbouring cells.
+    Instead of growing the sample from active points one by one like Bridson's algorithm does,
+    a candidate is thrown into every empty cell at once. Cells are split into 9 phases (3x3 pattern),
+    cells of the same phase are far enough from each other that their candidates never conflict,
+    so a whole phase can be accepted in one vectorized step.
+    :param rounds: number of candidates thrown into each empty cell
+    :param rng: random generator to use instead of the global state of `np.random`
+    """
+    rng = np.random if rng is None else rng
+    (min_x, max_x), (min_y, max_y) = bounding_box_2d
+    width, height = max_x - min_x, max_y - min_y
+    radius = (POISSON_DISK_DENSITY * width * height / number_of_points) ** 0.5
+    cell_size = radius / 2 ** 0.5
+    grid_width, grid_height = int(np.ceil(width / cell_size)), int(np.ceil(height / cell_size))
+
+    # point index in every cell or -1, padded with two empty cells on each side
+    point_by_cell = -np.ones((grid_width + 4, grid_height + 4), dtype=np.int64)
+    points = np.empty((grid_width * grid_height, 2))
+    points_count = 0
+
+    cell_x, cell_y = np.meshgrid(np.arange(grid_width), np.arange(grid_height), indexing="ij")
+    cell_x, cell_y = cell_x.ravel(), cell_y.ravel()
+    phase_by_cell = (cell_x % 3) * 3 + cell_y % 3
+    empty_cells_by_phase = [np.flatnonzero(phase_by_cell == phase) for phase in range(9)]
+    for _ in range(rounds):
+        for phase, empty_cells in enumerate(empty_cells_by_phase):
+            empty_cells = empty_cells[point_by_cell[cell_x[empty_cells] + 2, cell_y[empty_cells] + 2] < 0]
+            empty_cells_by_phase[phase] = empty_cells
+
+            candidates = (np.column_stack([cell_x[empty_cells], cell_y[empty_cells]])
+                          + rng.random((len(empty_cells), 2))) * cell_size
+            accepted = (candidates[:, 0] < width) & (candidates[:, 1] < height)
+
+            neighbours = point_by_cell[cell_x[empty_cells, None] + 2 + _NEIGHBOURING_CELLS[:, 0],
+                                       cell_y[empty_cells, None] + 2 + _NEIGHBOURING_CELLS[:, 1]]
+            candidate_ids, neighbour_ids = np.nonzero(neighbours >= 0)
+            difference = points[neighbours[candidate_ids, neighbour_ids]] - candidates[candidate_ids]
+            too_close = difference[:, 0] ** 2 + difference[:, 1] ** 2 < radius ** 2
+            accepted[candidate_ids[too_close]] = False
+
+            accepted_ids = np.flatnonzero(accepted)
+            new_points_count = points_count + len(accepted_ids)
+            points[points_count:new_points_count] = candidates[accepted_ids]
+            point_by_cell[cell_x[empty_cells[accepted_ids]] + 2,
+                          cell_y[empty_cells[accepted_ids]] + 2] = np.arange(points_count, new_points_count)
+            points_count = new_points_count
+
+    points = points[:points_count]
+    if points_count > number_of_points:
+        points = points[np.sort(rng.choice(points_count, number_of_points, replace=False))]
+    return points + [min_x, min_y]
@@ -0,0 +1,33 @@
+from typing import List
+
+import data
+from pipeline import Stage
+from world_generation import voronoi, mountain_chains, heightmap, rivers, terrains, fixes, clustering
+
+MESH_STAGES = ["voronoi", "conversion"]
+
+
+def map_stages(number_of_points, bounding_box_2d, relaxation_steps=8) -> List[Stage]:
+    """
+    All stages of generating a map. The mesh (Voronoi diagram and its conversion to the world)
+    doesn't depend on the seed, so it's generated once for every number of points and shared by all maps.
+    """
+    return [
+        # stop relaxing when points move on average by less than 3% of the distance between them
+        Stage("voronoi", voronoi.relaxed_voronoi, params={
+            "number_of_points": number_of_points,
+            "bounding_box_2d": bounding_box_2d,
+            "relaxation_steps": relaxation_steps,
+            "mirror_margin": voronoi.default_mirror_margin(number_of_points, bounding_box_2d),
+            "tolerance": 0.03 / number_of_points ** 0.5,
+        }, rng="numpy", seeded=False),
+        Stage("conversion", data.convert_voronoi_to_world, inputs={"vor": "voronoi"}, seeded=False),
+        Stage("mountain_chains", mountain_chains.create_mountain_chains, inputs={"world": "conversion"},
+              params={"number_of_chains": 11}, rng="python"),
+        Stage("heightmap", heightmap.create_heightmap, inputs={"world": "mountain_chains"}),
+        Stage("rivers", rivers.generate_rivers, inputs={"world": "heightmap"}, params={"rivers": 17}, rng="python"),
+        Stage("terrains", terrains.generate_terrains, inputs={"world": "rivers"}),
+        Stage("fixes", fixes.remove_artifacts_before_clustering, inputs={"world": "terrains"}),
+        Stage("clustering", clustering.cluster_terrains, inputs={"world": "fixes"}),
+        Stage("fixes_after_clustering", fixes.remove_artifacts_after_clustering, inputs={"world": "clustering"}),
+    ]
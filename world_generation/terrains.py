@@ -1,10 +1,7 @@
-import data
-from collections import Counter
-
+import numpy as np
 
-def most_frequent(list_of_values):
-    occurrence_count = Counter(list_of_values)
-    return occurrence_count.most_common(1)[0][0]
+import data
+import graph
 
 
 class TerrainTypes:
@@ -18,69 +15,82 @@ class TerrainTypes:
     PLAINS = "plains"
 
 
+class TerrainCodes:
+    """
+    Integer codes of terrains, stored as uint8 in `World.terrain_codes`.
+    When regions are assigned the most common terrain of their vertices, ties go to the lowest code.
+    """
+    DEEP_WATER = 0
+    GRASSLAND = 1
+    LAKE = 2
+    MOUNTAIN = 3
+    DECIDUOUS_FOREST = 4
+    CONIFEROUS_FOREST = 5
+    PLAINS = 6
+    SHALLOW_WATER = 7
+
+
+TERRAIN_NAME_BY_CODE = [
+    TerrainTypes.DEEP_WATER,
+    TerrainTypes.GRASSLAND,
+    TerrainTypes.LAKE,
+    TerrainTypes.MOUNTAIN,
+    TerrainTypes.DECIDUOUS_FOREST,
+    TerrainTypes.CONIFEROUS_FOREST,
+    TerrainTypes.PLAINS,
+    TerrainTypes.SHALLOW_WATER,
+]
+
+
 def generate_terrains(world: data.World):
     world.moisture_by_vertex = _generate_moisture(world)
-    terrain_by_vertex = {}
-    lake_vertices = _get_inland_water_vertices(world)
-    for vertex_id in world.vertices_touching_vertex:
-        if vertex_id in lake_vertices:
-            terrain_by_vertex[vertex_id] = TerrainTypes.LAKE
-        else:
-            terrain_by_vertex[vertex_id] = _terrain_by_height_and_moisture(
-                world.height_by_vertex[vertex_id],
-                world.moisture_by_vertex[vertex_id])
-    terrain_by_region = {}
-    for region_id, vertices in world.vertices_by_region.items():
-        most_common_terrain_across_vertices = most_frequent([terrain_by_vertex[v] for v in vertices])
-        terrain_by_region[region_id] = most_common_terrain_across_vertices
-    world.terrain_by_region = terrain_by_region
-
-
-def _terrain_by_height_and_moisture(height, moisture):
-    if height < -0.2:
-        return TerrainTypes.DEEP_WATER
-    if height < 0:
-        return TerrainTypes.SHALLOW_WATER
-    if height > 0.6:
-        return TerrainTypes.MOUNTAIN
-    if height > 0.45 and moisture > 0.7:
-        return TerrainTypes.CONIFEROUS_FOREST
-    if height > 0.1 and moisture > 0.7:
-        return TerrainTypes.DECIDUOUS_FOREST
-    if moisture > 0.5:
-        return TerrainTypes.GRASSLAND
-    else:
-        return TerrainTypes.PLAINS
+    code_by_vertex = _terrain_codes_by_height_and_moisture(world.vertex_array(world.height_by_vertex),
+                                                           world.vertex_array(world.moisture_by_vertex))
+    code_by_vertex[_get_inland_water_vertices(world)] = TerrainCodes.LAKE
+    set_terrain_codes(world.incidence().majority(code_by_vertex, len(TERRAIN_NAME_BY_CODE)), world)
+
+
+def set_terrain_codes(terrain_codes: np.ndarray, world: data.World):
+    world.terrain_codes = terrain_codes.astype(np.uint8)
+    world.terrain_by_region = data.CodedMapping(world.terrain_codes, TERRAIN_NAME_BY_CODE)
+
+
+def _terrain_codes_by_height_and_moisture(height: np.ndarray, moisture: np.ndarray) -> np.ndarray:
+    return np.select([height < -0.2,
+                      height < 0,
+                      height > 0.6,
+                      (height > 0.45) & (moisture > 0.7),
+                      (height > 0.1) & (moisture > 0.7),
+                      moisture > 0.5],
+                     [TerrainCodes.DEEP_WATER,
+                      TerrainCodes.SHALLOW_WATER,
+                      TerrainCodes.MOUNTAIN,
+                      TerrainCodes.CONIFEROUS_FOREST,
+                      TerrainCodes.DECIDUOUS_FOREST,
+                      TerrainCodes.GRASSLAND],
+                     TerrainCodes.PLAINS).astype(np.uint8)
 
 
 def _generate_moisture(world: data.World):
     lake_vertices = _get_inland_water_vertices(world)
-    moisture = {vertex_id: 0.0 for vertex_id in world.vertices_touching_vertex.keys()}
-    for vertex_id in lake_vertices:
-        moisture[vertex_id] = 1.0
+    wet_vertices = list(lake_vertices)
     for river in world.rivers:
-        for vertex_id in river:
-            moisture[vertex_id] = 1.0
-
-    to_visit = set([vertex_id for vertex_id, m in moisture.items() if m == 1.0])
-    visited = set()
-    while to_visit:
-        curr_vertex = to_visit.pop()
-        if curr_vertex in visited:
-            continue
-        for neighbour in world.vertices_touching_vertex[curr_vertex]:
-            new_moisture = moisture[curr_vertex] * 0.98
-            if new_moisture > moisture[neighbour]:
-                moisture[neighbour] = new_moisture
-                to_visit.add(neighbour)
-        visited.add(curr_vertex)
+        wet_vertices += river
 
-    return moisture
+    propagated_moisture = graph.propagate_decay(world.vertex_graph, wet_vertices, 1.0, 0.98)
+    return {vertex_id: max(0.0, m) for vertex_id, m in
+            zip(world.vertex_graph.nodes.tolist(), propagated_moisture[world.vertex_graph.nodes].tolist())}
 
 
 def _get_inland_water_vertices(world: data.World):
-    vertices_touching_border = data.vertices_touching_border(world)
+    vertices_touching_border = np.array(data.vertices_touching_border(world), dtype=np.int64)
 
-    sea_vertices = data.walk_over_vertices(vertices_touching_border, lambda v: world.height_by_vertex[v] < 0, world)
+    water = world.vertex_array(world.height_by_vertex) < 0
+    water_body_by_vertex, _ = graph.label_components(world.vertex_graph, mask=water)
+    # water reached from the border, either on it or next to it
+    vertices_close_to_border = np.concatenate([vertices_touching_border,
+                                               world.vertex_graph.edges_from(vertices_touching_border)[1]])
+    sea_water_bodies = np.unique(water_body_by_vertex[vertices_close_to_border])
 
-    return [v for v, height in world.height_by_vertex.items() if height < 0 and v not in sea_vertices]
+    inland_water = water & ~np.isin(water_body_by_vertex, sea_water_bodies[sea_water_bodies >= 0])
+    return np.flatnonzero(inland_water).tolist()
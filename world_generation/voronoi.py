@@ -1,10 +1,15 @@
 # Used code from https://stackoverflow.com/a/33602171
+import itertools
 import sys
+import time
+from typing import Callable
 
 import numpy as np
 import scipy as sp
 import scipy.spatial
 
+from world_generation import sampling
+
 
 def _centroid_region(vertices):
     # Polygon's signed area
@@ -24,35 +29,65 @@ def _centroid_region(vertices):
     return np.array([[C_x, C_y]])
 
 
+def _centroids_of_regions(vertices, regions) -> np.ndarray:
+    """
+    Batched version of `_centroid_region` computing centroids of all regions at once.
+    Regions are flattened into a single array of vertex ids and shoelace sums are reduced per region.
+    """
+    region_sizes = np.array([len(region) for region in regions], dtype=np.int64)
+    flat_regions = np.fromiter(itertools.chain.from_iterable(regions), dtype=np.int64, count=region_sizes.sum())
+    region_ends = np.cumsum(region_sizes)
+    region_starts = region_ends - region_sizes
+    next_in_region = np.arange(1, len(flat_regions) + 1)
+    next_in_region[region_ends - 1] = region_starts
+
+    x, y = vertices[flat_regions, 0], vertices[flat_regions, 1]
+    next_x, next_y = x[next_in_region], y[next_in_region]
+    s = x * next_y - next_x * y
+    area = 0.5 * np.add.reduceat(s, region_starts)
+    c_x = np.add.reduceat((x + next_x) * s, region_starts) / (6.0 * area)
+    c_y = np.add.reduceat((y + next_y) * s, region_starts) / (6.0 * area)
+    return np.column_stack([c_x, c_y])
+
+
 def _filter_regions(bounding_box, vor):
+    return [vor.regions[region_index] for region_index in _filter_region_indices(bounding_box, vor).tolist()]
+
+
+def _filter_region_indices(bounding_box, vor) -> np.ndarray:
+    """
+    Indices of non-empty regions of `vor.regions` which are bounded and have all vertices within the bounding box
+    """
     eps = sys.float_info.epsilon
-    regions = []
-    for region in vor.regions:
-        flag = True
-        for index in region:
-            if index == -1:
-                flag = False
-                break
-            else:
-                x = vor.vertices[index, 0]
-                y = vor.vertices[index, 1]
-                if not (bounding_box[0] - eps <= x <= bounding_box[1] + eps and
-                        bounding_box[2] - eps <= y <= bounding_box[3] + eps):
-                    flag = False
-                    break
-        if region != [] and flag:
-            regions.append(region)
-    return regions
-
-
-def _mirror_points_along_boundaries(bounding_box, points_center):
-    points_left = np.copy(points_center)
+    vertex_in_box = _filter_is_in_bounding_box(vor.vertices, bounding_box + np.array([-eps, eps, -eps, eps]))
+
+    region_sizes = np.array([len(region) for region in vor.regions], dtype=np.int64)
+    flat_regions = np.fromiter(itertools.chain.from_iterable(vor.regions), dtype=np.int64, count=region_sizes.sum())
+    entry_in_box = (flat_regions != -1) & vertex_in_box[np.maximum(flat_regions, 0)]
+
+    non_empty = region_sizes > 0
+    region_starts = (np.cumsum(region_sizes) - region_sizes)[non_empty]
+    region_in_box = np.zeros(len(region_sizes), dtype=bool)
+    region_in_box[non_empty] = np.logical_and.reduceat(entry_in_box, region_starts)
+    return np.flatnonzero(region_in_box)
+
+
+def _mirror_points_along_boundaries(bounding_box, points_center, margin=None):
+    """
+    :param margin: when given, only points closer than `margin` to the boundary are mirrored along it
+    """
+    def close_to(coordinate, boundary):
+        if margin is None:
+            return np.ones(len(points_center), dtype=bool)
+        return np.abs(points_center[:, coordinate] - boundary) <= margin
+
+    points_left = points_center[close_to(0, bounding_box[0])]
     points_left[:, 0] = bounding_box[0] - (points_left[:, 0] - bounding_box[0])
-    points_right = np.copy(points_center)
+    points_right = points_center[close_to(0, bounding_box[1])]
     points_right[:, 0] = bounding_box[1] + (bounding_box[1] - points_right[:, 0])
-    points_down = np.copy(points_center)
+    points_down = points_center[close_to(1, bounding_box[2])]
     points_down[:, 1] = bounding_box[2] - (points_down[:, 1] - bounding_box[2])
-    points_up = np.copy(points_center)
+    points_up = points_center[close_to(1, bounding_box[3])]
     points_up[:, 1] = bounding_box[3] + (bounding_box[3] - points_up[:, 1])
     points = np.append(points_center,
                        np.append(np.append(points_left,
@@ -66,6 +101,15 @@ def _mirror_points_along_boundaries(bounding_box, points_center):
     return points
 
 
+def default_mirror_margin(number_of_points, bounding_box_2d):
+    """
+    Margin wide enough for cells along the boundary to stay identical to the ones computed with full mirroring.
+    It's a few average distances between neighbouring points.
+    """
+    (min_x, max_x), (min_y, max_y) = bounding_box_2d
+    return 5 * ((max_x - min_x) * (max_y - min_y) / number_of_points) ** 0.5
+
+
 def _filter_is_in_bounding_box(points, bounding_box):
     return np.logical_and(np.logical_and(bounding_box[0] <= points[:, 0],
                                          points[:, 0] <= bounding_box[1]),
@@ -73,28 +117,76 @@ def _filter_is_in_bounding_box(points, bounding_box):
                                          points[:, 1] <= bounding_box[3]))
 
 
-def _voronoi(points, bounding_box) -> sp.spatial.Voronoi:
+def _voronoi(points, bounding_box, mirror_margin=None) -> sp.spatial.Voronoi:
     i = _filter_is_in_bounding_box(points, bounding_box)
     # Mirror points
     points_center = points[i, :]
-    points = _mirror_points_along_boundaries(bounding_box, points_center)
+    points = _mirror_points_along_boundaries(bounding_box, points_center, mirror_margin)
     # Compute Voronoi
     vor = sp.spatial.Voronoi(points)
     # Filter regions
     vor.filtered_points = points_center
-    vor.filtered_regions = _filter_regions(bounding_box, vor)
+    vor.filtered_region_indices = _filter_region_indices(bounding_box, vor)
+    vor.filtered_regions = [vor.regions[region_index] for region_index in vor.filtered_region_indices.tolist()]
     return vor
 
 
-def relaxed_voronoi(number_of_points, bounding_box_2d, relaxation_steps):
-    random_points = np.random.rand(number_of_points, 2)
+def _points_of_filtered_regions(vor) -> np.ndarray:
+    """
+    Points which generated `vor.filtered_regions`, in the same order
+    """
+    point_by_region = np.empty(len(vor.regions), dtype=np.int64)
+    point_by_region[vor.point_region] = np.arange(len(vor.point_region))
+    return vor.points[point_by_region[vor.filtered_region_indices]]
+
+
+class RelaxationStep:
+    def __init__(self, step, centroids_seconds, voronoi_seconds, mean_displacement, max_displacement):
+        self.step = step
+        self.centroids_seconds = centroids_seconds
+        self.voronoi_seconds = voronoi_seconds
+        self.mean_displacement = mean_displacement
+        self.max_displacement = max_displacement
+
+
+def relaxed_voronoi(number_of_points, bounding_box_2d, relaxation_steps,
+                    on_step: Callable[[RelaxationStep], None] = None, mirror_margin=None,
+                    tolerance=None, convergence="mean", sampler=sampling.uniform_points,
+                    rng: np.random.Generator = None):
+    """
+    :param relaxation_steps: number of Lloyd relaxation steps, or the maximum number of them if `tolerance` is given
+    :param on_step: optional hook called with timings and centroid displacement of every Lloyd relaxation step
+    :param mirror_margin: mirror only points within this distance from the boundary, see `default_mirror_margin`
+    :param tolerance: stop relaxing when the mean (or max, depending on `convergence`) distance
+    between points and centroids of their regions drops below it
+    :param sampler: function generating initial points for given number of points and bounding box,
+    `sampling.poisson_disk_points` gives regular cells with zero or one relaxation step
+    :param rng: random generator passed to the sampler, the global state of `np.random` is used by default
+    """
+    if convergence not in ("mean", "max"):
+        raise ValueError("convergence must be either 'mean' or 'max'")
+    random_points = sampler(number_of_points, bounding_box_2d, rng=rng)
     bounding_box = np.array(bounding_box_2d).ravel()
-    vor = _voronoi(random_points, bounding_box)
+    vor = _voronoi(random_points, bounding_box, mirror_margin)
+    vor.relaxation_history = []
     for i in range(relaxation_steps):
-        centroids = []
-        for region in vor.filtered_regions:
-            vertices = vor.vertices[region + [region[0]], :]
-            centroid = _centroid_region(vertices)
-            centroids.append(list(centroid[0, :]))
-        vor = _voronoi(np.array(centroids), bounding_box)
+        step_start = time.perf_counter()
+        centroids = _centroids_of_regions(vor.vertices, vor.filtered_regions)
+        displacement = np.linalg.norm(centroids - _points_of_filtered_regions(vor), axis=1)
+        mean_displacement, max_displacement = float(displacement.mean()), float(displacement.max())
+        centroids_end = time.perf_counter()
+
+        converged = tolerance is not None and \
+            (mean_displacement if convergence == "mean" else max_displacement) < tolerance
+        if not converged:
+            history = vor.relaxation_history
+            vor = _voronoi(centroids, bounding_box, mirror_margin)
+            vor.relaxation_history = history
+        step = RelaxationStep(i, centroids_end - step_start, time.perf_counter() - centroids_end,
+                              mean_displacement, max_displacement)
+        vor.relaxation_history.append(step)
+        if on_step:
+            on_step(step)
+        if converged:
+            break
     return vor